@@ -1,4 +1,5 @@
 # app/__init__.py
+import os
 from flask import Flask
 from config import Config
 from database.connection import db_connection
@@ -12,50 +13,72 @@ def create_app():
     # Инициализация базы данных
     init_database(app)
     
+    # Профилирование SQL-запросов
+    if app.config.get('DB_PROFILER_ENABLED'):
+        init_profiler(app)
+    
     # Регистрация маршрутов
     register_blueprints(app)
     
     return app
 
 def init_database(app):
-    """Инициализация базы данных"""
-    with app.app_context():
-        try:
-            db_connection.create_tables()
-            print("Таблицы базы данных созданы успешно")
-            
-            # Добавляем тестовые компании если их нет
-            from database.queries import db
-            session = db_connection.get_session()
-            from database.models import Company
-            
-            existing = session.query(Company).count()
-            if existing == 0:
-                test_companies = [
-                    ("Саханефтегазсбыт", "СНГС"),
-                    ("Туймаада-Нефть", "ТУЙМААДА"),
-                    ("Сибойл", "СИБОЙЛ"),
-                    ("ЭКТО-Ойл", "ЭКТО"),
-                    ("Сибирское топливо", "СИБТОП"),
-                    ("Паритет", "ПАРИТЕТ")
-                ]
-                
-                for name, code in test_companies:
-                    company = Company(name=name, code=code)
-                    session.add(company)
-                
-                session.commit()
-                print("Тестовые компании добавлены")
-        except Exception as e:
-            print(f"Ошибка при инициализации БД: {e}")
-        finally:
-            db_connection.close_session()
+    """Проверка схемы БД; таблицы и тестовые компании создает bootstrap (bootstrap_db.py)"""
+    from database.bootstrap import ensure_schema
+    try:
+        ensure_schema()
+    except Exception as e:
+        print(f"Ошибка при инициализации БД: {e}")
+
+def init_report_template():
+    """Предварительная компиляция шаблона отчета"""
+    from reports.template_cache import get_compiled_template
+    try:
+        get_compiled_template()
+    except FileNotFoundError as e:
+        print(f"⚠️ {e}")
+
+def warm_up():
+    """Прогрев процесса-воркера: шаблон отчета и кэш компаний"""
+    from database.queries import db
+    init_report_template()
+    try:
+        companies = db.get_companies()
+        print(f"🔥 Воркер {os.getpid()} прогрет: шаблон отчета, компаний в кэше: {len(companies)}")
+    except Exception as e:
+        print(f"⚠️ Прогрев кэша компаний не удался: {e}")
+
+def init_profiler(app):
+    """Подключение профилировщика SQL к engine и границам HTTP-запросов"""
+    from flask import request
+    from database.profiler import query_profiler
+    
+    query_profiler.install(db_connection.engine)
+    
+    @app.before_request
+    def _start_query_profile():
+        route = request.url_rule.rule if request.url_rule else request.path
+        query_profiler.start_request(route, request.method, request.path)
+    
+    @app.after_request
+    def _finish_query_profile(response):
+        query_profiler.finish_request(response.status_code)
+        return response
+    
+    @app.teardown_request
+    def _abort_query_profile(exc):
+        # after_request не вызывается при необработанном исключении
+        if exc is not None:
+            query_profiler.finish_request(500)
 
 def register_blueprints(app):
     """Регистрация маршрутов"""
-    from app.routes import main_bp, upload_bp, report_bp, api_bp, admin_bp
+    from app.routes import main_bp, upload_bp, report_bp, api_bp, admin_bp, analytics_bp, export_bp, events_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(upload_bp)
     app.register_blueprint(report_bp)
     app.register_blueprint(api_bp)
-    app.register_blueprint(admin_bp)
\ No newline at end of file
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(events_bp)
\ No newline at end of file
@@ -0,0 +1,102 @@
+# app/admission.py
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import jsonify
+from config import Config
+
+class AdmissionRejected(Exception):
+    """Запрос не принят: очередь заполнена (429) или место не освободилось за время ожидания (503)"""
+
+    def __init__(self, message: str, status: int = 429, retry_after: int = None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after or Config.ADMISSION_RETRY_AFTER
+
+class ConcurrencyLimiter:
+    """Не больше limit одновременных тяжелых запросов в процессе.
+
+    Сверх лимита до queue_size запросов ждут освобождения места не дольше
+    wait_timeout секунд, остальные сразу получают 429. Отказ быстрый и не
+    занимает память: файл не читается, книга не открывается.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, wait_timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise AdmissionRejected(f'Сервер занят ({self.name}): повторите запрос позже', 429)
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.wait_timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise AdmissionRejected(f'Сервер занят ({self.name}): очередь не продвинулась, повторите позже', 503)
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'limit': self.limit, 'active': self.active, 'waiting': self.waiting,
+                    'queue_size': self.queue_size, 'rejected': self.rejected}
+
+def rejection_response(error: AdmissionRejected):
+    response = jsonify({'success': False, 'error': error.message, 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def limit_concurrency(limiter: ConcurrencyLimiter):
+    """Маршрут выполняется, только получив место в limiter; иначе 429/503 с Retry-After"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                limiter.acquire()
+            except AdmissionRejected as e:
+                return rejection_response(e)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
+
+# Разбор загруженных книг (загрузка и тестовый разбор в админке)
+upload_limiter = ConcurrencyLimiter('загрузка', Config.UPLOAD_CONCURRENCY, Config.UPLOAD_QUEUE_SIZE,
+                                    Config.UPLOAD_QUEUE_TIMEOUT)
+
+# Потоки SSE: без очереди - сверх лимита клиент сразу переходит на опрос статуса
+event_stream_limiter = ConcurrencyLimiter('поток событий', Config.EVENT_STREAMS_MAX, 0, 0)
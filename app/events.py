@@ -0,0 +1,130 @@
+# app/events.py
+import json
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional
+from config import Config
+
+# Событие, после которого операция закончена и поток SSE закрывается
+TERMINAL_EVENTS = ('done', 'error')
+CHANNEL_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+class _Channel:
+    def __init__(self, history: int):
+        self.seq = 0
+        self.history = deque(maxlen=history)
+        self.subscribers = []
+        self.finished = False
+        self.updated = time.monotonic()
+
+class EventBus:
+    """Каналы событий хода загрузки и генерации отчетов для SSE (/events/<channel>).
+
+    publish не блокирует поток обработки: событие кладется в ограниченные
+    очереди подписчиков через put_nowait, медленный клиент при переполнении
+    теряет события (счетчик dropped), а не тормозит парсинг или рендер.
+    Последние события канала хранятся, поэтому клиент, подключившийся
+    после начала операции или переподключившийся с Last-Event-ID,
+    получает уже прошедшие этапы. Каналы живут в памяти процесса и
+    создаются только сервером (open): задание отчета при постановке в
+    очередь, загрузка - через POST /events перед отправкой файла.
+    """
+
+    def __init__(self, queue_size: int = None, history: int = None, ttl: float = None):
+        self.queue_size = queue_size or Config.EVENT_QUEUE_SIZE
+        self.history = history or Config.EVENT_HISTORY
+        self.ttl = Config.EVENT_CHANNEL_TTL if ttl is None else ttl
+        self.dropped = 0
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def open(self, channel: str = None) -> str:
+        """Регистрация канала (id задания или новый случайный id); возвращает id канала"""
+        channel = channel or secrets.token_hex(16)
+        with self._lock:
+            if channel not in self._channels:
+                self._prune()
+                self._channels[channel] = _Channel(self.history)
+        return channel
+
+    def exists(self, channel: Optional[str]) -> bool:
+        with self._lock:
+            return channel in self._channels
+
+    def publish(self, channel: str, event: str, **data):
+        with self._lock:
+            state = self._channels.get(channel)
+            if state is None:
+                # Канал не открыт или уже удален по ttl - событие некому показать
+                return
+            state.seq += 1
+            item = (state.seq, event, {'event': event, 'time': time.time(), **data})
+            state.history.append(item)
+            state.updated = time.monotonic()
+            if event in TERMINAL_EVENTS:
+                state.finished = True
+            for subscriber in state.subscribers:
+                try:
+                    subscriber.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+
+    def emitter(self, channel: Optional[str]) -> Optional[Callable]:
+        """Хук events(stage, **data) для сервисов; None - канала нет, события не публикуются"""
+        if not channel:
+            return None
+        return lambda event, **data: self.publish(channel, event, **data)
+
+    def stream(self, channel: str, last_id: int = 0) -> Iterator[str]:
+        """Текст text/event-stream: прошедшие события после last_id, затем новые до done/error.
+
+        Поток закрывается не позже EVENT_STREAM_MAX_SECONDS, чтобы не держать
+        поток веб-сервера; браузер переподключается сам с Last-Event-ID.
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            state = self._channels.get(channel)
+            if state is None:
+                return
+            if state.finished and last_id >= state.seq:
+                # Переподключение после done/error - новых событий не будет
+                return
+            for item in state.history:
+                if item[0] > last_id:
+                    subscriber.put_nowait(item)
+            state.subscribers.append(subscriber)
+
+        deadline = time.monotonic() + Config.EVENT_STREAM_MAX_SECONDS
+        try:
+            # Интервал переподключения браузера при обрыве
+            yield 'retry: 2000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    seq, event, data = subscriber.get(timeout=Config.EVENT_HEARTBEAT)
+                except queue.Empty:
+                    # Комментарий держит соединение открытым через прокси
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n'
+                if event in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                state.subscribers.remove(subscriber)
+
+    def _prune(self):
+        # Вызывается под self._lock при создании канала: каналы без подписчиков и событий дольше ttl
+        cutoff = time.monotonic() - self.ttl
+        for name in [name for name, state in self._channels.items()
+                     if state.updated < cutoff and not state.subscribers]:
+            del self._channels[name]
+
+def valid_channel(channel: str) -> bool:
+    return bool(channel and CHANNEL_PATTERN.match(channel))
+
+# Общая шина событий процесса
+event_bus = EventBus()
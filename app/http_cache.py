@@ -0,0 +1,89 @@
+# app/http_cache.py
+import hashlib
+import threading
+from datetime import timezone
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, make_response, request
+from config import Config
+from database.versioning import data_versions, GLOBAL_SCOPE
+
+class ResponseCache:
+    """Готовые ответы GET-маршрутов в памяти процесса.
+
+    Запись хранит версию данных, на которой построен ответ; после загрузки
+    версия растет и запись считается устаревшей. Размер ограничен
+    Config.HTTP_CACHE_MAX_ENTRIES, вытесняются давно не запрошенные.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or Config.HTTP_CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, version: int, response: Response):
+        headers = [(name, value) for name, value in response.headers if name not in ('ETag', 'Last-Modified')]
+        with self._lock:
+            self._entries[key] = (version, (response.get_data(), response.status_code, headers))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Общий кэш ответов процесса
+response_cache = ResponseCache()
+
+def cached_response(scope: str = GLOBAL_SCOPE):
+    """ETag/Last-Modified по версии данных и кэш ответа до следующей загрузки.
+
+    Клиент с актуальным If-None-Match получает 304 без вызова маршрута,
+    остальные - сохраненный ответ, пока версия данных scope не изменилась.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            version = data_versions.current(scope)
+            key = request.full_path
+            etag = hashlib.sha1(f'{key}|{scope}|{version}'.encode('utf-8')).hexdigest()
+            if etag in request.if_none_match:
+                response = Response(status=304)
+                return _validators(response, etag, scope)
+
+            cached = response_cache.get(key, version)
+            if cached is not None:
+                body, status, headers = cached
+                response = Response(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                response_cache.put(key, version, response)
+                response.headers['X-Cache'] = 'MISS'
+            return _validators(response, etag, scope).make_conditional(request)
+        return wrapper
+    return decorator
+
+def _validators(response: Response, etag: str, scope: str) -> Response:
+    response.set_etag(etag)
+    updated_at = data_versions.updated_at(scope)
+    if updated_at is not None:
+        # updated_at - локальное время сервера
+        response.last_modified = updated_at.astimezone(timezone.utc)
+    # Клиент хранит ответ, но каждый раз сверяет ETag
+    response.cache_control.no_cache = True
+    return response
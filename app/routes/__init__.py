@@ -4,6 +4,9 @@ from .upload_routes import upload_bp
 from .report_routes import report_bp
 from .api_routes import api_bp
 from .admin_routes import admin_bp
+from .analytics_routes import analytics_bp
+from .export_routes import export_bp
+from .event_routes import events_bp
 
 # Экспорт всех blueprint'ов
-__all__ = ['main_bp', 'upload_bp', 'report_bp', 'api_bp', 'admin_bp', ]
\ No newline at end of file
+__all__ = ['main_bp', 'upload_bp', 'report_bp', 'api_bp', 'admin_bp', 'analytics_bp', 'export_bp', 'events_bp', ]
\ No newline at end of file
@@ -1,9 +1,12 @@
 from flask import Blueprint, render_template, jsonify, request, send_file
-from database.queries import DatabaseQueries
-from parser.unified_parser import UnifiedParser
-from reports.template_report_generator import TemplateReportGenerator
+from database.queries import DatabaseQueries, query_cache
+from app.admission import AdmissionRejected, event_stream_limiter, limit_concurrency, rejection_response, upload_limiter
+from app.services.report_jobs import report_jobs
 from database.models import UploadedFile, Company  # Добавляем импорт моделей
 from database.connection import db_connection  # Добавляем импорт соединения
+from database.profiler import query_profiler
+from database.file_catalog import file_catalog
+from config import Config
 import os
 import traceback
 from datetime import datetime
@@ -23,6 +26,7 @@ def admin_dashboard():
                          now=datetime.now())
 
 @admin_bp.route('/admin/test-parse')
+@limit_concurrency(upload_limiter)
 def test_parse():
     """Тестирование парсера"""
     try:
@@ -46,6 +50,7 @@ def test_parse():
             })
         
         # Парсим файл
+        from parser.unified_parser import UnifiedParser
         parser = UnifiedParser(file_path)
         result = parser.parse_all()
         
@@ -89,30 +94,55 @@ def check_db_data():
             'error': str(e)
         })
 
+@admin_bp.route('/admin/rebuild-fuel-facts', methods=['POST'])
+def rebuild_fuel_facts():
+    """Перестроение узкой таблицы фактов из широких таблиц листов"""
+    try:
+        db = DatabaseQueries()
+        facts = db.rebuild_fuel_facts()
+        
+        return jsonify({
+            'success': True,
+            'facts': facts
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @admin_bp.route('/admin/generate-from-existing')
 def generate_from_existing():
     """Создание отчета с существующими данными из базы"""
     try:
-        db = DatabaseQueries()
-        generator = TemplateReportGenerator(db)
-        
-        # Генерируем отчет
-        report_path = generator.generate_report()
+        # Отчет строится в общей очереди заданий (лимит и объединение одинаковых запросов);
+        # готовый берется из кэша, если данные не менялись
+        job = report_jobs.submit(datetime.now().date(), generated_by='admin')
+        if not job.wait(Config.REPORT_SYNC_TIMEOUT):
+            return jsonify({
+                'success': True,
+                'message': 'Отчет еще строится',
+                'job_id': job.id,
+                'status_url': f'/report-status/{job.id}'
+            }), 202
         
-        if report_path and os.path.exists(report_path):
-            filename = os.path.basename(report_path)
+        if job.status == 'done' and job.filename:
             return jsonify({
                 'success': True,
-                'message': 'Отчет успешно создан из данных базы',
-                'filename': filename,
-                'download_url': f'/download-report/{filename}'
+                'message': 'Отчет взят из кэша' if job.cached else 'Отчет успешно создан из данных базы',
+                'filename': job.filename,
+                'cached': job.cached,
+                'download_url': f'/download-report/{job.filename}'
             })
         else:
             return jsonify({
                 'success': False,
-                'error': 'Не удалось создать отчет'
+                'error': job.error or 'Не удалось создать отчет'
             })
             
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -124,6 +154,7 @@ def generate_from_existing():
 def debug_template():
     """Отладка структуры шаблона"""
     try:
+        from reports.template_report_generator import TemplateReportGenerator
         generator = TemplateReportGenerator(None)
         generator.debug_template_structure()
         
@@ -142,35 +173,25 @@ def debug_template():
 def system_status():
     """Статус системы"""
     try:
-        # Используем прямое соединение с БД
-        session = db_connection.get_session()
-        total_files = session.query(UploadedFile).count()
-        total_companies = session.query(Company).count()
-        processed_files = session.query(UploadedFile).filter(
-            UploadedFile.status == 'processed'
-        ).count()
-        
-        # Проверяем наличие шаблона
-        template_path = 'report_templates/Сводный_отчет_шаблон.xlsx'
-        template_exists = os.path.exists(template_path)
-        
-        # Проверяем папку загрузок
-        uploads_dir = 'uploads'
-        uploads_exists = os.path.exists(uploads_dir)
-        uploads_files = len(os.listdir(uploads_dir)) if uploads_exists else 0
+        db = DatabaseQueries()
+        stats = db.get_system_stats()
+        
+        # Состояние файловой системы меняется только при загрузке - кэшируем до следующей
+        filesystem = query_cache.get('system_filesystem', _filesystem_status, scope=UploadedFile.__tablename__)
         
         return jsonify({
             'success': True,
             'status': {
                 'database': {
-                    'files_total': total_files,
-                    'files_processed': processed_files,
-                    'companies': total_companies
+                    'files_total': stats['files_total'],
+                    'files_processed': stats['files_processed'],
+                    'companies': stats['companies_total']
                 },
-                'filesystem': {
-                    'template_exists': template_exists,
-                    'uploads_exists': uploads_exists,
-                    'uploads_files': uploads_files
+                'filesystem': filesystem,
+                'admission': {
+                    'uploads': upload_limiter.stats(),
+                    'reports': report_jobs.stats(),
+                    'event_streams': event_stream_limiter.stats()
                 },
                 'timestamp': datetime.now().isoformat()
             }
@@ -181,5 +202,50 @@ def system_status():
             'success': False,
             'error': str(e)
         })
+
+def _filesystem_status():
+    """Наличие шаблона и число загрузок в каталоге файлов (без просмотра папки)"""
+    template_path = 'report_templates/Сводный_отчет_шаблон.xlsx'
+    session = db_connection.session_factory()
+    try:
+        uploads_files = session.query(UploadedFile).count()
     finally:
-        db_connection.close_session()
\ No newline at end of file
+        session.close()
+    return {
+        'template_exists': os.path.exists(template_path),
+        'uploads_exists': os.path.isdir(Config.UPLOAD_FOLDER),
+        'uploads_files': uploads_files
+    }
+
+@admin_bp.route('/admin/reconcile-files', methods=['POST'])
+def reconcile_files():
+    """Сверка каталога отчетов и загрузок с файлами на диске"""
+    try:
+        stats = file_catalog.reconcile()
+        query_cache.clear()
+        return jsonify({'success': True, 'stats': stats})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@admin_bp.route('/admin/db-profile')
+def db_profile():
+    """Профиль SQL-запросов: самые медленные запросы, N+1 и худший запрос по маршрутам"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        if request.args.get('reset') == '1':
+            query_profiler.reset()
+        
+        return jsonify({
+            'success': True,
+            'enabled': query_profiler.enabled,
+            'profile': query_profiler.report(limit=limit)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
@@ -0,0 +1,56 @@
+# app/routes/analytics_routes.py
+from flask import Blueprint, jsonify, request
+from datetime import datetime
+from app.services.analytics import analytics, AnalyticsUnavailable
+
+analytics_bp = Blueprint('analytics', __name__)
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _run(query, **kwargs):
+    """Выполнение аналитического запроса с единообразной обработкой ошибок"""
+    try:
+        rows = query(**kwargs)
+        return jsonify({'success': True, 'source': analytics.source, 'rows': rows})
+    except AnalyticsUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Некорректный параметр: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/api/analytics/sales-trend')
+def sales_trend():
+    """Динамика реализации по объектам (?company_id=&location=&date_from=&date_to=&period=day|week|month)"""
+    try:
+        date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Некорректная дата: {e}'}), 400
+    return _run(analytics.sales_trend,
+                company_id=request.args.get('company_id', type=int),
+                location=request.args.get('location'),
+                date_from=date_from,
+                date_to=date_to,
+                period=request.args.get('period', 'day'))
+
+@analytics_bp.route('/api/analytics/stock-coverage')
+def stock_coverage():
+    """Запас в днях реализации по объектам на дату (?as_of=&company_id=)"""
+    try:
+        as_of = _date_arg('as_of')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Некорректная дата: {e}'}), 400
+    return _run(analytics.stock_coverage,
+                as_of=as_of,
+                company_id=request.args.get('company_id', type=int))
+
+@analytics_bp.route('/api/analytics/fuel-totals')
+def fuel_totals():
+    """Суммы по компаниям, показателям и видам топлива (?date_from=&date_to=)"""
+    try:
+        date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Некорректная дата: {e}'}), 400
+    return _run(analytics.fuel_totals, date_from=date_from, date_to=date_to)
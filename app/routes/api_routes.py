@@ -1,21 +1,83 @@
 # app/routes/api_routes.py
-from flask import Blueprint, jsonify
-from database.queries import db
+from flask import Blueprint, jsonify, request
+from datetime import datetime
+from urllib.parse import urlencode
+from config import Config
+from app.http_cache import cached_response
+from database.queries import db, SHEET_MODELS
 from database.models import UploadedFile, Company  # Импортируем модели напрямую
 from database.connection import db_connection  # Импортируем соединение с БД
 
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/api/recent-files')
+@cached_response()
 def api_recent_files():
-    """API для получения последних файлов"""
+    """API последних файлов постранично (?limit=&cursor=).
+
+    Тело - список файлов, как и раньше; курсор следующей страницы -
+    в заголовках X-Next-Cursor и Link (rel="next").
+    """
+    try:
+        files, next_cursor = db.get_recent_files_page(limit=_page_limit(20), cursor=request.args.get('cursor'))
+        response = jsonify(files)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{_next_page_url(next_cursor)}>; rel="next"'
+        return response
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Некорректный параметр: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/sheets/<sheet>/rows')
+def api_sheet_rows(sheet):
+    """Строки листа в колоночном JSON (?company_id=|company=&date_from=&date_to=&columns=&limit=&cursor=)"""
+    if sheet not in SHEET_MODELS:
+        return jsonify({'error': f'Неизвестный лист: {sheet}'}), 404
     try:
-        files = db.get_recent_files(limit=20)
-        return jsonify(files)
+        company_id = request.args.get('company_id', type=int)
+        if company_id is None and request.args.get('company'):
+            company_id = db.get_company_id(request.args['company'])
+            if company_id is None:
+                return jsonify({'error': 'Компания не найдена'}), 404
+        columns = request.args.get('columns')
+        page = db.get_sheet_rows(
+            sheet,
+            company_id=company_id,
+            date_from=_date_arg('date_from'),
+            date_to=_date_arg('date_to'),
+            columns=[c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+            limit=_page_limit(),
+            cursor=request.args.get('cursor')
+        )
+        if page['next_cursor']:
+            page['next_url'] = _next_page_url(page['next_cursor'])
+        return jsonify(page)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Некорректный параметр: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _page_limit(default: int = None) -> int:
+    limit = request.args.get('limit', default or Config.API_PAGE_SIZE, type=int)
+    return max(1, min(limit, Config.API_PAGE_MAX))
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _list_arg(name):
+    value = request.args.get(name)
+    return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+def _next_page_url(cursor: str) -> str:
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    return f'{request.path}?{urlencode(args)}'
+
 @api_bp.route('/api/companies')
+@cached_response()
 def api_companies():
     """API для получения списка компаний"""
     try:
@@ -29,6 +91,7 @@ def api_companies():
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/api/file-details/<int:file_id>')
+@cached_response()
 def api_file_details(file_id):
     """API для получения деталей файла"""
     try:
@@ -54,25 +117,36 @@ def api_file_details(file_id):
         db_connection.close_session()
 
 @api_bp.route('/api/stats')
+@cached_response()
 def api_stats():
     """API для получения статистики системы"""
     try:
-        session = db_connection.get_session()
-        
-        total_files = session.query(UploadedFile).count()
-        processed_files = session.query(UploadedFile).filter(UploadedFile.status == 'processed').count()
-        total_companies = session.query(Company).filter(Company.is_active == True).count()
-        
-        # Последний загруженный файл
-        last_file = session.query(UploadedFile).order_by(UploadedFile.upload_date.desc()).first()
+        stats = db.get_system_stats()
+        last_upload = stats['last_upload']
         
         return jsonify({
-            'total_files': total_files,
-            'processed_files': processed_files,
-            'total_companies': total_companies,
-            'last_upload': last_file.upload_date.strftime('%d.%m.%Y %H:%M') if last_file else 'Нет данных'
+            'total_files': stats['files_total'],
+            'processed_files': stats['files_processed'],
+            'total_companies': stats['companies_active'],
+            'last_upload': last_upload.strftime('%d.%m.%Y %H:%M') if last_upload else 'Нет данных'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        db_connection.close_session()
+
+@api_bp.route('/api/fuel-totals')
+def api_fuel_totals():
+    """API агрегатов по узкой таблице фактов (показатель/топливо/период/компания)"""
+    try:
+        totals = db.get_fuel_totals(
+            metrics=_list_arg('metric'),
+            fuel_types=_list_arg('fuel_type'),
+            date_from=_date_arg('date_from'),
+            date_to=_date_arg('date_to'),
+            company_id=request.args.get('company_id', type=int),
+            group_by=tuple(_list_arg('group_by') or ('metric', 'fuel_type'))
+        )
+        return jsonify(totals)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Некорректный параметр: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,35 @@
+# app/routes/event_routes.py
+from flask import Blueprint, Response, jsonify, request
+from app.admission import AdmissionRejected, event_stream_limiter, rejection_response
+from app.events import event_bus, valid_channel
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/events', methods=['POST'])
+def open_channel():
+    """Новый канал событий для загрузки: клиент передает его как upload_id вместе с файлом"""
+    channel = event_bus.open()
+    return jsonify({'success': True, 'channel': channel, 'events_url': f'/events/{channel}'})
+
+@events_bp.route('/events/<channel>')
+def event_stream(channel):
+    """Server-Sent Events хода операции: id задания отчета или upload_id загрузки"""
+    if not valid_channel(channel):
+        return jsonify({'success': False, 'error': 'Некорректный канал событий'}), 400
+    if not event_bus.exists(channel):
+        return jsonify({'success': False, 'error': 'Канал событий не найден'}), 404
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        last_id = 0
+    try:
+        event_stream_limiter.acquire()
+    except AdmissionRejected as e:
+        return rejection_response(e)
+    response = Response(event_bus.stream(channel, last_id), mimetype='text/event-stream')
+    # Место освобождается, когда сервер закрывает ответ (в т.ч. при обрыве клиента)
+    response.call_on_close(event_stream_limiter.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx не буферизует поток - события доходят до браузера сразу
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
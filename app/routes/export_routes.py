@@ -0,0 +1,143 @@
+# app/routes/export_routes.py
+import csv
+import io
+import json
+from datetime import datetime, date
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import Integer, SmallInteger, Float, Date, DateTime, Boolean
+from database.queries import DatabaseQueries, SHEET_MODELS
+
+export_bp = Blueprint('export', __name__)
+
+# Полные значения Content-Type (передаются как content_type, чтобы Flask не добавил charset повторно)
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Строк в пачке курсора / в группе строк Parquet
+EXPORT_BATCH_SIZE = 5000
+
+@export_bp.route('/export/<sheet>.<fmt>')
+def export_sheet(sheet, fmt):
+    """Потоковая выгрузка строк листа (?date_from=&date_to=&company_id=|company=)"""
+    if sheet not in SHEET_MODELS:
+        return jsonify({'success': False, 'error': f'Неизвестный лист: {sheet}'}), 404
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'Неизвестный формат: {fmt}'}), 400
+
+    try:
+        date_from = _date_arg('date_from')
+        date_to = _date_arg('date_to')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Некорректная дата: {e}'}), 400
+
+    db = DatabaseQueries()
+    company_id = request.args.get('company_id', type=int)
+    if company_id is None and request.args.get('company'):
+        company_id = db.get_company_id(request.args['company'])
+        if company_id is None:
+            return jsonify({'success': False, 'error': 'Компания не найдена'}), 404
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'success': False, 'error': 'Для Parquet требуется pyarrow'}), 503
+
+    batches = db.iter_sheet_batches(sheet, date_from, date_to, company_id, batch_size=EXPORT_BATCH_SIZE)
+    writers = {'csv': _stream_csv, 'ndjson': _stream_ndjson, 'parquet': _stream_parquet}
+    body = writers[fmt](batches)
+
+    period = '_'.join(d.strftime('%Y%m%d') for d in (date_from, date_to) if d)
+    filename = f"{sheet}{'_' + period if period else ''}.{fmt}"
+    return Response(
+        stream_with_context(body),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _stream_csv(batches):
+    columns = next(batches)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    # BOM, чтобы Excel открыл кириллицу без мастера импорта
+    buffer.write('\ufeff')
+    writer.writerow([c.name for c in columns])
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+def _stream_ndjson(batches):
+    names = [c.name for c in next(batches)]
+    for batch in batches:
+        yield ''.join(
+            json.dumps(dict(zip(names, row)), ensure_ascii=False, default=_json_default) + '\n'
+            for row in batch
+        )
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+class _ChunkSink(io.RawIOBase):
+    """Приемник для ParquetWriter: накопленные байты забираются после каждой группы строк"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _stream_parquet(batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = next(batches)
+    schema = pa.schema([pa.field(c.name, _arrow_type(c.type, pa)) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def _arrow_type(column_type, pa):
+    if isinstance(column_type, (Integer, SmallInteger)):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    return pa.string()
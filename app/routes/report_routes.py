@@ -1,9 +1,15 @@
 # app/routes/report_routes.py
 import os
 import glob
-from flask import Blueprint, request, jsonify, send_file
-from reports.template_report_generator import TemplateReportGenerator
-from database.queries import DatabaseQueries
+import unicodedata
+from urllib.parse import quote
+from flask import Blueprint, Response, request, jsonify, send_file
+from app.admission import AdmissionRejected, rejection_response
+from app.services.report_jobs import report_jobs
+from app.services.report_cache import SUMMARY_REPORT_NAME
+from app.services.report_batch import BATCH_OUTPUTS
+from database.file_catalog import file_catalog
+from config import Config
 from datetime import datetime
 import traceback
 
@@ -11,9 +17,9 @@ report_bp = Blueprint('report', __name__)
 
 @report_bp.route('/generate-report', methods=['POST'])
 def generate_report():
-    """Генерация сводного отчета"""
+    """Постановка сводного отчета в фоновую очередь"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         report_date = data.get('report_date')
         
         if report_date:
@@ -21,27 +27,21 @@ def generate_report():
         else:
             report_date = datetime.now().date()
         
-        db = DatabaseQueries()
-        generator = TemplateReportGenerator(db)
+        # Отчет строится в пуле потоков, ход - в /report-status/<job_id> и потоком SSE /events/<job_id>
+        # Вариант отчета - имя записи ReportConfig (по умолчанию сводный).
+        # Такой же незавершенный запрос возвращает уже идущее задание
+        job = report_jobs.submit(report_date, config_name=data.get('report_config') or SUMMARY_REPORT_NAME)
         
-        report_path = generator.generate_report(report_date)
-        
-        if report_path and os.path.exists(report_path):
-            filename = os.path.basename(report_path)
-            
-            # Возвращаем только имя файла, путь будем искать динамически
-            return jsonify({
-                'success': True,
-                'message': 'Отчет успешно сгенерирован',
-                'filename': filename,
-                'download_url': f'/download-report/{filename}'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Не удалось создать отчет'
-            })
+        return jsonify({
+            'success': True,
+            'message': 'Генерация отчета запущена',
+            'job_id': job.id,
+            'status_url': f'/report-status/{job.id}',
+            'events_url': f'/events/{job.id}'
+        }), 202
             
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -49,90 +49,85 @@ def generate_report():
             'details': traceback.format_exc()
         })
 
+@report_bp.route('/generate-report-batch', methods=['POST'])
+def generate_report_batch():
+    """Пакет отчетов за диапазон дат: {date_from, date_to, output: zip|entries, report_config}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        date_from = datetime.strptime(data['date_from'], '%Y-%m-%d').date()
+        date_to = datetime.strptime(data.get('date_to') or data['date_from'], '%Y-%m-%d').date()
+        output = data.get('output') or 'zip'
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Некорректный диапазон дат: {e}'}), 400
+    
+    if output not in BATCH_OUTPUTS:
+        return jsonify({'success': False, 'error': f'Неизвестный формат результата: {output}'}), 400
+    if date_from > date_to or (date_to - date_from).days + 1 > Config.REPORT_BATCH_MAX_DAYS:
+        return jsonify({'success': False, 'error': f'Диапазон должен быть от 1 до {Config.REPORT_BATCH_MAX_DAYS} дней'}), 400
+    
+    try:
+        job = report_jobs.submit_batch(date_from, date_to, output,
+                                       config_name=data.get('report_config') or SUMMARY_REPORT_NAME)
+    except AdmissionRejected as e:
+        return rejection_response(e)
+    return jsonify({
+        'success': True,
+        'message': 'Пакетная генерация отчетов запущена',
+        'job_id': job.id,
+        'status_url': f'/report-status/{job.id}',
+        'events_url': f'/events/{job.id}'
+    }), 202
+
+@report_bp.route('/report-status/<job_id>')
+def report_status(job_id):
+    """Статус фоновой генерации отчета и ход записи по листам"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Задание не найдено'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 @report_bp.route('/download-report/<filename>')
 def download_report(filename):
-    """Универсальное скачивание отчета - ищем файл по всему проекту"""
+    """Скачивание отчета по имени файла через каталог отчетов (generated_reports)"""
     try:
-        print(f"🔍 Поиск файла: {filename}")
-        
         # Безопасная обработка имени файла
         if not filename or '..' in filename or '/' in filename:
             return jsonify({'success': False, 'error': 'Некорректное имя файла'}), 400
         
-        # 1. Определяем корневую директорию проекта
-        current_dir = os.getcwd()
-        print(f"📁 Текущая директория: {current_dir}")
-        
-        # 2. Ищем файл во всех возможных местах
-        search_locations = [
-            # В текущей директории и поддиректориях
-            current_dir,
-            # Папка reports_output в корне
-            os.path.join(current_dir, 'reports_output'),
-            # Папка app/reports_output
-            os.path.join(current_dir, 'app', 'reports_output'),
-            # На уровень выше
-            os.path.dirname(current_dir),
-            # На уровень выше + reports_output
-            os.path.join(os.path.dirname(current_dir), 'reports_output'),
-        ]
+        # Один запрос по индексу имени вместо поиска по папкам
+        report = file_catalog.find_report(filename)
+        if report is None:
+            return jsonify({'success': False, 'error': f'Файл {filename} не найден'}), 404
         
-        # Добавляем стандартные папки проекта
-        search_locations.extend([
-            'reports_output',
-            '../reports_output',
-            './reports_output',
-            'app/reports_output',
-            '../app/reports_output'
-        ])
+        # Файл у клиента актуален - 304 без обращения к диску
+        if report.checksum and report.checksum in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(report.checksum)
+            return response
         
-        found_path = None
-        for location in search_locations:
-            if not os.path.exists(location):
-                continue
-                
-            # Ищем файл в этой локации
-            potential_path = os.path.join(location, filename)
-            if os.path.exists(potential_path):
-                found_path = potential_path
-                print(f"✅ Файл найден: {found_path}")
-                break
-                
-            # Ищем рекурсивно во всех подпапках
-            for root, dirs, files in os.walk(location):
-                if filename in files:
-                    found_path = os.path.join(root, filename)
-                    print(f"✅ Файл найден рекурсивно: {found_path}")
-                    break
-            if found_path:
-                break
-        
-        if not found_path:
-            # Покажем все доступные отчеты для отладки
-            print("📊 Доступные файлы отчетов:")
-            for location in search_locations:
-                if os.path.exists(location):
-                    try:
-                        files = os.listdir(location)
-                        xlsx_files = [f for f in files if f.endswith('.xlsx')]
-                        if xlsx_files:
-                            print(f"   {location}: {xlsx_files}")
-                    except PermissionError:
-                        continue
-            
+        found_path = os.path.abspath(report.file_path)
+        if not os.path.exists(found_path):
             return jsonify({
                 'success': False,
-                'error': f'Файл {filename} не найден',
-                'search_locations': search_locations,
-                'current_directory': current_dir
+                'error': f'Файл {filename} есть в каталоге, но отсутствует на диске (запустите сверку каталога)'
             }), 404
         
-        # Скачиваем файл
+        mimetype = 'application/zip' if filename.endswith('.zip') else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        if Config.DOWNLOAD_OFFLOAD == 'x-accel':
+            response = _accel_redirect(found_path, filename, mimetype, report.checksum)
+            if response is not None:
+                return response
+        
+        # Сильный ETag из контрольной суммы каталога; conditional - 304 и докачка по Range (206).
+        # При USE_X_SENDFILE тело отдает веб-сервер по заголовку X-Sendfile
         return send_file(
             found_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mimetype=mimetype,
+            etag=report.checksum or True,
+            last_modified=report.generated_at,
+            conditional=True
         )
             
     except Exception as e:
@@ -143,30 +138,33 @@ def download_report(filename):
             'traceback': traceback.format_exc()
         }), 500
 
+def _accel_redirect(path: str, filename: str, mimetype: str, etag: str = None):
+    """Ответ с X-Accel-Redirect: файл, Range и докачку отдает nginx; None - файл вне REPORTS_FOLDER"""
+    relative = os.path.relpath(path, os.path.abspath(Config.REPORTS_FOLDER))
+    if relative.startswith('..'):
+        return None
+    response = Response(mimetype=mimetype)
+    response.headers['X-Accel-Redirect'] = Config.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+    # Имя файла как в send_file: ASCII-вариант и filename* в UTF-8
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    if etag:
+        response.set_etag(etag)
+    return response
+
 @report_bp.route('/list-reports')
 def list_reports():
-    """Список всех доступных отчетов (для отладки)"""
+    """Список доступных отчетов из каталога"""
     try:
-        reports = []
-        search_dirs = ['reports_output', '../reports_output', 'app/reports_output']
-        
-        for dir_path in search_dirs:
-            if os.path.exists(dir_path):
-                for file in os.listdir(dir_path):
-                    if file.endswith('.xlsx') and 'сводный' in file.lower():
-                        full_path = os.path.join(dir_path, file)
-                        stats = os.stat(full_path)
-                        reports.append({
-                            'filename': file,
-                            'path': full_path,
-                            'size': stats.st_size,
-                            'modified': datetime.fromtimestamp(stats.st_mtime).strftime('%d.%m.%Y %H:%M'),
-                            'absolute_path': os.path.abspath(full_path)
-                        })
-        
+        limit = request.args.get('limit', 100, type=int)
         return jsonify({
             'success': True,
-            'reports': reports,
+            'reports': file_catalog.list_reports(limit=limit),
             'current_directory': os.getcwd(),
             'absolute_current': os.path.abspath(os.getcwd())
         })
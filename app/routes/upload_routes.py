@@ -3,13 +3,18 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
 import traceback
+from app.admission import limit_concurrency, upload_limiter
 from app.services.file_processor import FileProcessor
+from app.events import event_bus
 
 upload_bp = Blueprint('upload', __name__)
 
 @upload_bp.route('/upload', methods=['POST'])
+@limit_concurrency(upload_limiter)
 def upload_file():
-    """Загрузка файла"""
+    """Загрузка файла; ход обработки - в /events/<upload_id>, если клиент открыл канал (POST /events)"""
+    upload_id = request.form.get('upload_id')
+    events = event_bus.emitter(upload_id if event_bus.exists(upload_id) else None)
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'Файл не выбран'}), 400
@@ -27,7 +32,7 @@ def upload_file():
         file.save(file_path)
         
         # Обрабатываем файл
-        processor = FileProcessor()
+        processor = FileProcessor(events=events)
         result = processor.process_file(filename, file_path)
         
         return jsonify(result)
@@ -35,4 +40,6 @@ def upload_file():
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Ошибка при загрузке файла: {error_details}")
+        if events:
+            events('error', error=str(e))
         return jsonify({'error': str(e), 'details': error_details}), 500
\ No newline at end of file
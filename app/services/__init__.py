@@ -1,8 +1,17 @@
 # app/services/__init__.py
 
-# Импортируем основные сервисы
-from .report_generator import ReportGenerator
-from .file_processor import FileProcessor
+# Сервисы импортируются при первом обращении (PEP 562): генератор отчетов
+# и обработчик файлов тянут openpyxl, а он не нужен для старта процесса
+_SERVICES = {
+    'ReportGenerator': '.report_generator',
+    'FileProcessor': '.file_processor',
+}
+
+def __getattr__(name):
+    if name in _SERVICES:
+        from importlib import import_module
+        return getattr(import_module(_SERVICES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Экспорт всех сервисов
 __all__ = ['ReportGenerator', 'FileProcessor']
\ No newline at end of file
@@ -0,0 +1,260 @@
+# app/services/analytics.py
+import importlib.util
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List
+from sqlalchemy.engine import make_url
+from config import Config
+from database.connection import db_connection
+from database.models import FUEL_METRICS, FUEL_TYPES
+from database.versioning import data_versions
+
+# Таблицы, доступные аналитическим запросам
+ANALYTICS_TABLES = [
+    'companies', 'uploaded_files',
+    'sheet1_structure', 'sheet2_demand', 'sheet3_balance', 'sheet4_supply',
+    'sheet5_sales', 'sheet6_aviation', 'sheet7_comments',
+    'fuel_facts', 'fuel_locations',
+]
+
+FUELS = ['ai92', 'ai95', 'ai98_100', 'diesel_winter', 'diesel_arctic', 'diesel_summer']
+
+class AnalyticsUnavailable(Exception):
+    """DuckDB не установлен или источник данных недоступен"""
+
+def _load_duckdb():
+    """DuckDB импортируется при первом аналитическом запросе, а не при старте процесса"""
+    try:
+        import duckdb
+    except ImportError:  # DuckDB - необязательная зависимость
+        return None
+    return duckdb
+
+class AnalyticsEngine:
+    """Встроенный DuckDB поверх таблиц листов.
+
+    Источник данных (Config.ANALYTICS_SOURCE):
+      'parquet'  - представления над выгрузкой export_parquet() в Config.ANALYTICS_PARQUET_DIR
+                   (данные на момент выгрузки - python export_parquet.py по расписанию);
+      'sqlite'   - ATTACH рабочей SQLite-базы только для чтения;
+      'snapshot' - копия таблиц в памяти DuckDB, обновляется при смене версии данных.
+    'auto' выбирает sqlite, а если расширение sqlite недоступно - snapshot; parquet
+    включается только явно. Аналитические сканы идут в DuckDB (колоночно,
+    в Config.ANALYTICS_THREADS потоков) и не конкурируют с записью при загрузке.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._source = None
+        self._snapshot_versions = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        # Проверка наличия пакета без его импорта
+        return importlib.util.find_spec('duckdb') is not None
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    # ------------------------------------------------------------------
+    # Подключение
+    # ------------------------------------------------------------------
+    def _connection(self):
+        duckdb = _load_duckdb()
+        if duckdb is None:
+            raise AnalyticsUnavailable('DuckDB не установлен (pip install duckdb)')
+        with self._lock:
+            if self._conn is None:
+                self._conn = duckdb.connect(':memory:', config={'threads': Config.ANALYTICS_THREADS})
+                self._source = self._attach(self._conn, duckdb)
+        if self._source == 'snapshot':
+            self._refresh_snapshot()
+        with self._lock:
+            return self._conn.cursor()
+
+    def _attach(self, conn, duckdb) -> str:
+        source = Config.ANALYTICS_SOURCE
+        parquet_dir = Config.ANALYTICS_PARQUET_DIR
+
+        if source == 'parquet' and parquet_dir and os.path.isdir(parquet_dir):
+            for table in ANALYTICS_TABLES:
+                pattern = os.path.join(parquet_dir, table, '*.parquet')
+                if os.path.isdir(os.path.dirname(pattern)):
+                    conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{pattern}')")
+            return 'parquet'
+        if source == 'parquet':
+            raise AnalyticsUnavailable(f'Parquet-выгрузка не найдена: {parquet_dir}')
+
+        if source in ('auto', 'sqlite'):
+            url = make_url(Config.SQLALCHEMY_DATABASE_URI)
+            if url.get_backend_name() == 'sqlite':
+                try:
+                    conn.execute('INSTALL sqlite; LOAD sqlite;')
+                    conn.execute(f"ATTACH '{os.path.abspath(url.database)}' AS fuel (TYPE SQLITE, READ_ONLY)")
+                    for table in ANALYTICS_TABLES:
+                        conn.execute(f'CREATE OR REPLACE VIEW {table} AS SELECT * FROM fuel.{table}')
+                    return 'sqlite'
+                except duckdb.Error as e:
+                    if source == 'sqlite':
+                        raise AnalyticsUnavailable(f'Не удалось подключить SQLite к DuckDB: {e}')
+                    print(f"⚠️ Расширение sqlite для DuckDB недоступно, используем копию таблиц: {e}")
+
+        return 'snapshot'
+
+    def _stale_tables(self, versions: Dict[str, int]) -> List[str]:
+        # Версия каждой таблицы - область data_versions с ее именем
+        return [table for table in ANALYTICS_TABLES if self._snapshot_versions.get(table) != versions.get(table, 0)]
+
+    def _refresh_snapshot(self):
+        """Копия таблиц в DuckDB; перечитываются только таблицы, чья версия сменилась.
+
+        Чтение из рабочей БД идет без общей блокировки (запросы к старой копии
+        продолжаются), под ней - только подмена таблиц одной транзакцией DuckDB.
+        """
+        versions = data_versions.versions()
+        if not self._stale_tables(versions):
+            return
+        # Перечитывает один поток; остальные дождутся и увидят свежие версии
+        with self._refresh_lock:
+            versions = data_versions.versions()
+            stale = self._stale_tables(versions)
+            if not stale:
+                return
+            import pandas as pd
+            with db_connection.engine.connect() as conn:
+                frames = {table: pd.read_sql_table(table, conn) for table in stale}
+            with self._lock:
+                self._conn.execute('BEGIN TRANSACTION')
+                try:
+                    for table, frame in frames.items():
+                        self._conn.register('_snapshot_frame', frame)
+                        self._conn.execute(f'CREATE OR REPLACE TABLE {table} AS SELECT * FROM _snapshot_frame')
+                        self._conn.unregister('_snapshot_frame')
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                # Версии сняты до чтения: запись, попавшая между ними, перечитается в следующий раз
+                self._snapshot_versions.update({table: versions.get(table, 0) for table in stale})
+
+    def query(self, sql: str, params: List[Any] = None) -> List[Dict[str, Any]]:
+        """Параметризованный запрос, результат - список словарей"""
+        cursor = self._connection()
+        try:
+            cursor.execute(sql, params or [])
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, self._plain(row))) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _plain(self, row):
+        return [v.isoformat() if isinstance(v, date) else v for v in row]
+
+    # ------------------------------------------------------------------
+    # Аналитические запросы
+    # ------------------------------------------------------------------
+    def sales_trend(self, company_id: int = None, location: str = None,
+                    date_from: date = None, date_to: date = None, period: str = 'day') -> List[Dict[str, Any]]:
+        """Динамика суточной реализации по объектам за период"""
+        if period not in ('day', 'week', 'month'):
+            raise ValueError(f'Неизвестный период: {period}')
+        daily = ', '.join(f'SUM(COALESCE(s.daily_{f}, 0)) AS {f}' for f in FUELS)
+        sql = f"""
+            SELECT CAST(date_trunc('{period}', CAST(s.report_date AS DATE)) AS DATE) AS period,
+                   c.name AS company, s.location_name AS location, {daily},
+                   SUM({' + '.join(f'COALESCE(s.daily_{f}, 0)' for f in FUELS)}) AS total
+            FROM sheet5_sales s
+            JOIN companies c ON c.id = s.company_id
+            WHERE (? IS NULL OR s.company_id = ?)
+              AND (? IS NULL OR s.location_name ILIKE '%' || ? || '%')
+              AND (? IS NULL OR CAST(s.report_date AS DATE) >= ?)
+              AND (? IS NULL OR CAST(s.report_date AS DATE) <= ?)
+            GROUP BY ALL
+            ORDER BY period, company, location
+        """
+        return self.query(sql, [company_id, company_id, location, location,
+                                date_from, date_from, date_to, date_to])
+
+    def stock_coverage(self, as_of: date = None, company_id: int = None) -> List[Dict[str, Any]]:
+        """Запас в днях реализации: последние остатки и продажи компании на дату"""
+        as_of = as_of or date.today()
+        stocks = ', '.join(f'SUM(COALESCE(b.stock_{f}, 0)) AS stock_{f}' for f in FUELS)
+        sales = ', '.join(f'SUM(COALESCE(s.daily_{f}, 0)) AS daily_{f}' for f in FUELS)
+        coverage = ', '.join(
+            f'b.stock_{f}, s.daily_{f}, b.stock_{f} / NULLIF(s.daily_{f}, 0) AS days_{f}' for f in FUELS
+        )
+        sql = f"""
+            WITH balance_dates AS (
+                SELECT company_id, MAX(CAST(report_date AS DATE)) AS report_date
+                FROM sheet3_balance WHERE CAST(report_date AS DATE) <= ? GROUP BY company_id
+            ),
+            sales_dates AS (
+                SELECT company_id, MAX(CAST(report_date AS DATE)) AS report_date
+                FROM sheet5_sales WHERE CAST(report_date AS DATE) <= ? GROUP BY company_id
+            ),
+            balance AS (
+                SELECT b.company_id, lower(trim(b.location_name)) AS location_key,
+                       any_value(b.location_name) AS location, any_value(d.report_date) AS report_date, {stocks}
+                FROM sheet3_balance b
+                JOIN balance_dates d ON d.company_id = b.company_id AND d.report_date = CAST(b.report_date AS DATE)
+                GROUP BY 1, 2
+            ),
+            sales AS (
+                SELECT s.company_id, lower(trim(s.location_name)) AS location_key, {sales}
+                FROM sheet5_sales s
+                JOIN sales_dates d ON d.company_id = s.company_id AND d.report_date = CAST(s.report_date AS DATE)
+                GROUP BY 1, 2
+            )
+            SELECT c.name AS company, b.location, b.report_date, {coverage}
+            FROM balance b
+            JOIN companies c ON c.id = b.company_id
+            LEFT JOIN sales s ON s.company_id = b.company_id AND s.location_key = b.location_key
+            WHERE (? IS NULL OR b.company_id = ?)
+            ORDER BY company, b.location
+        """
+        return self.query(sql, [as_of, as_of, company_id, company_id])
+
+    def fuel_totals(self, date_from: date = None, date_to: date = None) -> List[Dict[str, Any]]:
+        """Суммы по компаниям, показателям и видам топлива из таблицы фактов"""
+        metrics = ' '.join(f"WHEN {k} THEN '{v}'" for k, v in FUEL_METRICS.items())
+        fuels = ' '.join(f"WHEN {k} THEN '{v}'" for k, v in FUEL_TYPES.items())
+        sql = f"""
+            SELECT c.name AS company,
+                   CASE f.metric_id {metrics} END AS metric,
+                   CASE f.fuel_type_id {fuels} END AS fuel_type,
+                   SUM(f.value) AS value
+            FROM fuel_facts f
+            JOIN companies c ON c.id = f.company_id
+            WHERE (? IS NULL OR CAST(f.report_date AS DATE) >= ?)
+              AND (? IS NULL OR CAST(f.report_date AS DATE) <= ?)
+            GROUP BY ALL
+            ORDER BY company, metric, fuel_type
+        """
+        return self.query(sql, [date_from, date_from, date_to, date_to])
+
+def export_parquet(target_dir: str = None) -> Dict[str, int]:
+    """Выгрузка таблиц в <каталог>/<таблица>/data.parquet для ANALYTICS_SOURCE=parquet.
+
+    Файл каждой таблицы пишется рядом и подменяется через os.replace, поэтому
+    запросы к уже открытым представлениям не увидят недописанный Parquet.
+    """
+    import pandas as pd
+    target_dir = target_dir or Config.ANALYTICS_PARQUET_DIR
+    counts = {}
+    with db_connection.engine.connect() as conn:
+        for table in ANALYTICS_TABLES:
+            frame = pd.read_sql_table(table, conn)
+            table_dir = os.path.join(target_dir, table)
+            os.makedirs(table_dir, exist_ok=True)
+            partial = os.path.join(table_dir, 'data.parquet.partial')
+            frame.to_parquet(partial, index=False)
+            os.replace(partial, os.path.join(table_dir, 'data.parquet'))
+            counts[table] = len(frame)
+    return counts
+
+# Общий аналитический движок процесса
+analytics = AnalyticsEngine()
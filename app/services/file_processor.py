@@ -2,10 +2,11 @@
 import traceback
 from datetime import datetime
 from database.queries import db
-from parser.unified_parser import UnifiedParser
 
 class FileProcessor:
-    def __init__(self):
+    def __init__(self, events=None):
+        # events(stage, **data) - хук хода обработки (app.events.EventBus.emitter), None - без событий
+        self.events = events
         self.parsers = self._get_available_parsers()
     
     def _get_available_parsers(self):
@@ -13,6 +14,8 @@ class FileProcessor:
         parsers = []
         
         # Всегда используем UnifiedParser как основной
+        # (парсер тянет openpyxl - импортируется при первой обработке файла)
+        from parser.unified_parser import UnifiedParser
         parsers.append({
             'name': 'UnifiedParser',
             'class': UnifiedParser,
@@ -48,6 +51,8 @@ class FileProcessor:
         """Обработка файла с использованием доступных парсеров"""
         print(f"\n=== НАЧАЛО ОБРАБОТКИ ФАЙЛА: {filename} ===")
         print(f"Файл сохранен: {file_path}")
+        if self.events:
+            self.events('start', filename=filename)
         
         # Пробуем все доступные парсеры по порядку
         for parser_info in self.parsers:
@@ -59,20 +64,28 @@ class FileProcessor:
                     file_path,
                     parser_info['name']
                 )
+                if self.events:
+                    self.events('done', company=result['company'], report_date=result['report_date'],
+                                data_saved=result['data_saved'])
                 return result
             except Exception as e:
                 print(f"Парсер {parser_info['name']} не сработал: {e}")
                 continue
         
         # Если ни один парсер не сработал
+        error = 'Ни один из парсеров не смог обработать файл'
+        if self.events:
+            self.events('error', error=error)
         return {
-            'error': 'Ни один из парсеров не смог обработать файл',
+            'error': error,
             'success': False
         }
     
     def _process_with_parser(self, parser_class, filename, file_path, parser_name):
         """Обработка файла конкретным парсером"""
         parser = parser_class(file_path)
+        if self.events:
+            parser.on_sheet = lambda sheet_key, records: self.events('parse', sheet=sheet_key, records=records)
         all_data = parser.parse_all()
         
         metadata = all_data['metadata']
@@ -160,5 +173,7 @@ class FileProcessor:
                     print(f"✗ Ошибка сохранения {sheet_key}: {e}")
                     saved_counts[sheet_key] = 0
                     traceback.print_exc()
+                if self.events:
+                    self.events('save', sheet=sheet_key, records=saved_counts[sheet_key])
         
         return saved_counts
\ No newline at end of file
@@ -0,0 +1,141 @@
+# app/services/report_batch.py
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+from config import Config
+from database.connection import db_connection
+from database.versioning import data_versions
+from app.services.report_cache import ReportCache, SUMMARY_REPORT_NAME
+
+if TYPE_CHECKING:
+    from reports.template_report_generator import TemplateReportGenerator
+
+BATCH_OUTPUTS = ('zip', 'entries')
+
+class ReportBatch:
+    """Отчеты за каждый день диапазона одним проходом.
+
+    Шаблон и раскладка компилируются один раз, данные за весь диапазон
+    забираются одним запросом на лист (get_aggregated_data_range) и
+    раскладываются по дням в памяти, отчеты рендерятся в пуле процессов
+    (Config.REPORT_BATCH_PROCESSES). Результат - zip со всеми отчетами
+    или записи generated_reports, которые затем отдает кэш отчетов.
+    """
+
+    def __init__(self, db, config_name: str = SUMMARY_REPORT_NAME, processes: int = None):
+        self.db = db
+        self.config_name = config_name
+        self.processes = Config.REPORT_BATCH_PROCESSES if processes is None else processes
+
+    def run(self, date_from: date, date_to: date, output: str = 'zip',
+            generated_by: str = 'batch', progress=None) -> dict:
+        if output not in BATCH_OUTPUTS:
+            raise ValueError(f'Неизвестный формат результата: {output}')
+        if date_from > date_to:
+            raise ValueError('Начало диапазона позже конца')
+        days = (date_to - date_from).days + 1
+        if days > Config.REPORT_BATCH_MAX_DAYS:
+            raise ValueError(f'Диапазон больше {Config.REPORT_BATCH_MAX_DAYS} дней')
+
+        from reports.template_report_generator import TemplateReportGenerator
+        print(f"\n📚 ПАКЕТ ОТЧЕТОВ {date_from.strftime('%d.%m.%Y')} - {date_to.strftime('%d.%m.%Y')} ({days} дн.)")
+        version = data_versions.current()
+        cache = ReportCache(self.db)
+        session = db_connection.session_factory()
+        try:
+            report_config = cache.report_config(session, self.config_name)
+            generator = TemplateReportGenerator(self.db, template_path=report_config.template_path,
+                                                report_config=report_config.config)
+            result = {'reports': [], 'cached': [], 'skipped': []}
+
+            pending = {}
+            for report_date, aggregated in self.db.get_aggregated_data_range(date_from, date_to).items():
+                if not aggregated:
+                    result['skipped'].append(report_date.isoformat())
+                    continue
+                if output == 'entries':
+                    cached = cache.find_cached(session, report_config.id, report_date, version, generator)
+                    if cached:
+                        result['cached'].append(self._entry(report_date, cached.file_path))
+                        continue
+                pending[report_date] = aggregated
+
+            rendered = self._render_all(generator, report_config.config, pending, progress)
+
+            if output == 'entries':
+                for report_date, path in sorted(rendered.items()):
+                    cache.record(session, report_config.id, report_date, path, generated_by, version)
+                    result['reports'].append(self._entry(report_date, path))
+                session.commit()
+                cache.evict(session)
+            else:
+                zip_path = self._zip_reports(generator, rendered, date_from, date_to)
+                # Архив - в каталоге файлов для скачивания, но не в кэше отчетов на дату
+                cache.record(session, report_config.id, date_from, zip_path, generated_by, version, status='archive')
+                session.commit()
+                result['reports'] = [self._entry(d, None) for d in sorted(rendered)]
+                result['zip_path'] = zip_path
+            print(f"✅ Пакет готов: {len(rendered)} построено, {len(result['cached'])} из кэша, "
+                  f"{len(result['skipped'])} дн. без данных")
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _render_all(self, generator: 'TemplateReportGenerator', report_config: dict, pending: dict, progress=None) -> dict:
+        rendered = {}
+        total = len(pending)
+        paths = {report_date: generator.new_output_path() for report_date in pending}
+        if self.processes <= 1 or total <= 1:
+            for report_date, aggregated in pending.items():
+                generator.render(paths[report_date], aggregated, report_date, sheet_processes=0)
+                rendered[report_date] = paths[report_date]
+                if progress:
+                    progress('Отчеты', len(rendered), total)
+            return rendered
+
+        # spawn: родитель многопоточный; каждый процесс компилирует шаблон один раз
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.processes, total), mp_context=context) as executor:
+            futures = {
+                executor.submit(_render_report, generator.template_path, generator.backend, report_config,
+                                report_date, aggregated, paths[report_date]): report_date
+                for report_date, aggregated in pending.items()
+            }
+            for future in as_completed(futures):
+                rendered[futures[future]] = future.result()
+                if progress:
+                    progress('Отчеты', len(rendered), total)
+        return rendered
+
+    def _zip_reports(self, generator: 'TemplateReportGenerator', rendered: dict, date_from: date, date_to: date) -> str:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        zip_path = os.path.join(generator.reports_dir,
+                                f"Сводные_отчеты_{date_from.strftime('%Y%m%d')}_{date_to.strftime('%Y%m%d')}_{timestamp}.zip")
+        # xlsx уже сжат - складываем без повторного сжатия
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:
+            for report_date, path in sorted(rendered.items()):
+                zf.write(path, f"Сводный_отчет_{report_date.strftime('%Y-%m-%d')}.xlsx")
+                os.remove(path)
+        return zip_path
+
+    def _entry(self, report_date: date, path: str = None) -> dict:
+        entry = {'report_date': report_date.isoformat()}
+        if path:
+            filename = os.path.basename(path)
+            entry.update({'filename': filename, 'download_url': f'/download-report/{filename}'})
+        return entry
+
+def _render_report(template_path: str, backend: str, report_config: dict,
+                   report_date: date, aggregated: dict, output_path: str) -> str:
+    """Рендер одного отчета пакета (выполняется в рабочем процессе)"""
+    from reports.template_report_generator import TemplateReportGenerator
+    generator = TemplateReportGenerator(None, template_path=template_path, backend=backend,
+                                        report_config=report_config)
+    generator.render(output_path, aggregated, report_date, sheet_processes=0)
+    return output_path
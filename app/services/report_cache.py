@@ -0,0 +1,159 @@
+# app/services/report_cache.py
+import os
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Optional, Tuple
+from config import Config
+from database.connection import db_connection
+from database.models import GeneratedReport, ReportConfig
+from database.file_catalog import DOWNLOADABLE_STATUSES, describe_file
+from database.versioning import data_versions
+from reports.report_config import DEFAULT_REPORT_CONFIG, ReportConfigError
+from reports.template_cache import resolve_template_path
+from reports.sheet_part_cache import sheet_parts
+
+if TYPE_CHECKING:
+    from reports.template_report_generator import TemplateReportGenerator
+
+SUMMARY_REPORT_NAME = 'Сводный отчет'
+
+class ReportCache:
+    """Готовые отчеты в generated_reports с ключом (конфигурация, дата, версия данных).
+
+    Пока загрузок не было, глобальная версия данных не меняется и повторный
+    запрос на ту же дату отдает уже построенный файл. Новая загрузка повышает
+    версию - следующий запрос строит отчет заново. Старые записи и их файлы
+    удаляются по возрасту (Config.REPORT_CACHE_MAX_AGE_DAYS) и общему объему
+    (Config.REPORT_CACHE_MAX_BYTES).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def get_or_generate(self, report_date: date, generated_by: str = 'web', progress=None,
+                        config_name: str = SUMMARY_REPORT_NAME, events=None) -> Tuple[str, bool]:
+        """Путь к отчету и признак того, что он взят из кэша"""
+        from reports.template_report_generator import TemplateReportGenerator
+        # Версию фиксируем до построения: загрузка во время генерации даст новый ключ
+        version = data_versions.current()
+
+        # Собственная сессия: генератор закрывает общую scoped-сессию потока
+        session = db_connection.session_factory()
+        try:
+            report_config = self.report_config(session, config_name)
+            config_id = report_config.id
+            generator = TemplateReportGenerator(self.db, template_path=report_config.template_path,
+                                                report_config=report_config.config)
+            cached = self.find_cached(session, config_id, report_date, version, generator)
+            if cached:
+                print(f"♻️ Отчет из кэша: {cached.file_path} (версия данных {version})")
+                return cached.file_path, True
+
+            report_path = generator.generate_report(report_date, progress, events)
+            self.record(session, config_id, report_date, report_path, generated_by, version)
+            session.commit()
+            self.evict(session)
+            return report_path, False
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def find_cached(self, session, config_id: int, report_date: date, version: int,
+                    generator: 'TemplateReportGenerator') -> Optional[GeneratedReport]:
+        """Готовый отчет с тем же ключом, если его файл на месте и не старше шаблона"""
+        cached = session.query(GeneratedReport).filter(
+            GeneratedReport.report_config_id == config_id,
+            GeneratedReport.report_date == report_date,
+            GeneratedReport.data_version == version,
+            GeneratedReport.status == 'generated'
+        ).order_by(GeneratedReport.generated_at.desc()).first()
+        return cached if cached and self._is_fresh(cached, generator) else None
+
+    def record(self, session, config_id: int, report_date: date, report_path: str,
+               generated_by: str, version: int, status: str = 'generated') -> GeneratedReport:
+        """Запись отчета в каталог: абсолютный путь, имя, размер и контрольная сумма"""
+        report = GeneratedReport(
+            report_config_id=config_id,
+            report_date=report_date,
+            generated_by=generated_by,
+            data_version=version,
+            status=status,
+            **describe_file(report_path)
+        )
+        session.add(report)
+        return report
+
+    def _is_fresh(self, report: GeneratedReport, generator: 'TemplateReportGenerator') -> bool:
+        if not os.path.exists(report.file_path):
+            return False
+        # Шаблон изменился после построения отчета
+        template_changed = datetime.fromtimestamp(generator.template.mtime / 1e9)
+        return report.generated_at is not None and report.generated_at >= template_changed
+
+    def report_config(self, session, config_name: str = SUMMARY_REPORT_NAME) -> ReportConfig:
+        """Активная конфигурация отчета; сводный отчет по умолчанию создается при первом обращении"""
+        config = session.query(ReportConfig).filter(
+            ReportConfig.name == config_name, ReportConfig.is_active == True
+        ).first()
+        if config is None:
+            if config_name != SUMMARY_REPORT_NAME:
+                raise ReportConfigError(f'Конфигурация отчета не найдена: {config_name}')
+            config = ReportConfig(
+                name=SUMMARY_REPORT_NAME,
+                description='Сводный отчет по шаблону',
+                template_path=resolve_template_path(),
+                config=DEFAULT_REPORT_CONFIG
+            )
+            session.add(config)
+            session.flush()
+        elif not isinstance((config.config or {}).get('sheets'), dict):
+            # Запись без раскладки листов - заполняем раскладкой по умолчанию
+            config.config = DEFAULT_REPORT_CONFIG
+            session.flush()
+        return config
+
+    def evict(self, session=None) -> dict:
+        """Удаление старых отчетов сверх лимитов и записей, чьи файлы пропали"""
+        own_session = session is None
+        session = session or db_connection.session_factory()
+        stats = {'expired': 0, 'oversize': 0, 'missing': 0, 'parts': 0, 'freed_bytes': 0}
+        try:
+            cutoff = datetime.now() - timedelta(days=Config.REPORT_CACHE_MAX_AGE_DAYS)
+            reports = session.query(GeneratedReport).filter(
+                GeneratedReport.status.in_(DOWNLOADABLE_STATUSES)
+            ).order_by(GeneratedReport.generated_at.desc()).all()
+
+            total_size = 0
+            for report in reports:
+                if not os.path.exists(report.file_path):
+                    reason = 'missing'
+                elif report.generated_at is None or report.generated_at < cutoff:
+                    reason = 'expired'
+                elif total_size + (report.file_size or 0) > Config.REPORT_CACHE_MAX_BYTES:
+                    reason = 'oversize'
+                else:
+                    total_size += report.file_size or 0
+                    continue
+
+                if reason != 'missing':
+                    try:
+                        os.remove(report.file_path)
+                        stats['freed_bytes'] += report.file_size or 0
+                    except OSError as e:
+                        print(f"⚠️ Не удалось удалить {report.file_path}: {e}")
+                        continue
+                report.status = 'evicted'
+                stats[reason] += 1
+
+            session.commit()
+            stats['parts'] = sheet_parts.evict()
+            if stats['expired'] or stats['oversize'] or stats['missing'] or stats['parts']:
+                print(f"🧹 Кэш отчетов: {stats}")
+            return stats
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            if own_session:
+                session.close()
@@ -8,7 +8,8 @@ from flask import jsonify, request
 import os
 import traceback
 from database.queries import db
-from reports.template_report_generator import TemplateReportGenerator  # Ваш полный генератор
+from app.admission import AdmissionRejected, rejection_response
+from app.services.report_jobs import report_jobs
 
 class ReportGenerator:
 
@@ -22,19 +23,18 @@ class ReportGenerator:
         print(f"\n=== ГЕНЕРАЦИЯ СВОДНОГО ОТЧЁТА ===")
         print(f"Дата отчёта: {report_date}")
         
-        # Используем тот же генератор, что и для шаблона
-        generator = TemplateReportGenerator(self.db)
-        
-        # УБРАН aggregated_data из аргументов — генератор сам его получит
+        # Отчёт строится в фоне тем же генератором, что и для шаблона
         try:
-            report_path = generator.generate_report(report_date)
-            report_filename = os.path.basename(report_path)
+            job = report_jobs.submit(report_date)
             
             if request.method == 'GET':
-                return self._render_report_html(report_filename, report_date)
+                return self._render_job_html(job, 'Сводный отчёт')
             else:
-                return self._render_report_json(report_filename, report_path)
+                return self._render_job_json(job, 'Генерация сводного отчёта запущена')
                 
+        except AdmissionRejected as e:
+            # Очередь заполнена - 429 с Retry-After, а не 500
+            return rejection_response(e)
         except Exception as e:
             print(f"Ошибка генерации: {e}")
             traceback.print_exc()
@@ -47,17 +47,17 @@ class ReportGenerator:
         print(f"\n=== ГЕНЕРАЦИЯ ОТЧЁТА ПО ШАБЛОНУ ===")
         print(f"Дата отчёта: {report_date}")
         
-        generator = TemplateReportGenerator(self.db)
-        
         try:
-            report_path = generator.generate_report(report_date)
-            report_filename = os.path.basename(report_path)
+            job = report_jobs.submit(report_date)
             
             if request.method == 'GET':
-                return self._render_template_report_html(report_filename, report_date)
+                return self._render_job_html(job, 'Отчёт по шаблону')
             else:
-                return self._render_template_report_json(report_filename, report_path)
+                return self._render_job_json(job, 'Генерация отчёта по шаблону запущена')
                 
+        except AdmissionRejected as e:
+            # Очередь заполнена - 429 с Retry-After, а не 500
+            return rejection_response(e)
         except Exception as e:
             print(f"Ошибка генерации шаблонного отчёта: {e}")
             traceback.print_exc()
@@ -98,35 +98,19 @@ class ReportGenerator:
         else:
             return jsonify({'error': message, 'details': error_details}), 500
     
-    # HTML/JSON рендеры (оставьте как были или упростите)
-    def _render_report_html(self, filename, report_date):
-        return f"""
-        <h1>Сводный отчёт сгенерирован</h1>
-        <p>Файл: {filename}</p>
-        <p>Дата: {report_date.strftime('%d.%m.%Y')}</p>
-        <a href="/download-report/{filename}">Скачать</a>
-        """
-    
-    def _render_template_report_html(self, filename, report_date):
+    # HTML/JSON рендеры: готовый файл появится по ссылке из статуса задания
+    def _render_job_html(self, job, title):
         return f"""
-        <h1>Отчёт по шаблону сгенерирован</h1>
-        <p>Файл: {filename}</p>
-        <p>Дата: {report_date.strftime('%d.%m.%Y')}</p>
-        <a class="btn btn-download" href="/download-report/{filename}">Скачать Excel</a>
-        """
-    
-    def _render_report_json(self, filename, report_path):
-        return jsonify({
-            'success': True,
-            'filename': filename,
-            'download_url': f'/download-report/{filename}',
-            'message': 'Сводный отчёт готов'
-        })
+        <h1>{title}: генерация запущена</h1>
+        <p>Задание: {job.id}</p>
+        <p>Дата: {job.report_date.strftime('%d.%m.%Y')}</p>
+        <a href="/report-status/{job.id}">Статус и ссылка на файл</a>
+        """, 202
     
-    def _render_template_report_json(self, filename, report_path):
+    def _render_job_json(self, job, message):
         return jsonify({
             'success': True,
-            'filename': filename,
-            'download_url': f'/download-report/{filename}',
-            'message': 'Отчёт по шаблону готов'
-        })
\ No newline at end of file
+            'job_id': job.id,
+            'status_url': f'/report-status/{job.id}',
+            'message': message
+        }), 202
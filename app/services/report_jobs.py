@@ -0,0 +1,226 @@
+# app/services/report_jobs.py
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Optional
+from config import Config
+from app.admission import AdmissionRejected
+from app.events import event_bus
+from database.connection import db_connection
+from database.queries import DatabaseQueries
+from database.versioning import data_versions
+from app.services.report_cache import ReportCache, SUMMARY_REPORT_NAME
+from app.services.report_batch import ReportBatch
+
+class ReportJob:
+    """Задание на построение отчета и его ход по листам"""
+
+    def __init__(self, report_date: date, generated_by: str, config_name: str):
+        self.id = uuid.uuid4().hex
+        self.report_date = report_date
+        self.config_name = config_name
+        # Пакет за диапазон дат (submit_batch)
+        self.date_to = None
+        self.output = None
+        self.result = None
+        self.generated_by = generated_by
+        self.status = 'queued'  # queued, running, done, error
+        self.sheets = {}
+        self.filename = None
+        self.cached = False
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        # Ключ одинаковых запросов и число запросов, присоединенных к заданию
+        self.key = None
+        self.joined = 0
+        # События хода для SSE: канал /events/<id задания>
+        self.events = event_bus.emitter(self.id)
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Ожидание завершения задания; False - не завершилось за timeout"""
+        return self._finished.wait(timeout)
+
+    def update_progress(self, sheet_name: str, done: int, total: int):
+        with self._lock:
+            self.sheets[sheet_name] = {'done': done, 'total': total}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            sheets = dict(self.sheets)
+        unit = 'отчетов' if self.date_to else 'строк'
+        return {
+            'id': self.id,
+            'status': self.status,
+            'report_date': self.report_date.isoformat(),
+            'report_config': self.config_name,
+            'date_to': self.date_to.isoformat() if self.date_to else None,
+            'result': self.result,
+            'sheets': sheets,
+            'progress': [f"{name}: {p['done']}/{p['total']} {unit}" for name, p in sheets.items()],
+            'filename': self.filename,
+            'download_url': f'/download-report/{self.filename}' if self.filename else None,
+            'events_url': f'/events/{self.id}',
+            'cached': self.cached,
+            'joined': self.joined,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%d.%m.%Y %H:%M:%S'),
+            'finished_at': self.finished_at.strftime('%d.%m.%Y %H:%M:%S') if self.finished_at else None,
+        }
+
+class ReportJobManager:
+    """Фоновая генерация отчетов в пуле потоков (Config.REPORT_WORKERS).
+
+    Обработчик запроса только ставит задание и сразу возвращает его id,
+    ход записи листов доступен через статус задания. Задания хранятся
+    в памяти процесса и удаляются через Config.REPORT_JOB_TTL секунд
+    после завершения.
+
+    Одинаковые запросы (те же даты, конфигурация и версия данных), пока
+    задание не завершено, получают это же задание - отчет строится один
+    раз. Незавершенных заданий не больше REPORT_WORKERS + REPORT_QUEUE_SIZE,
+    сверх этого submit отказывает (AdmissionRejected -> 429).
+    """
+
+    def __init__(self, max_workers: int = None, queue_size: int = None):
+        self.max_workers = max_workers or Config.REPORT_WORKERS
+        self.queue_size = Config.REPORT_QUEUE_SIZE if queue_size is None else queue_size
+        self._executor = None
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report')
+            return self._executor
+
+    def submit(self, report_date: date, generated_by: str = 'web',
+               config_name: str = SUMMARY_REPORT_NAME) -> ReportJob:
+        self._prune()
+        job = ReportJob(report_date, generated_by, config_name)
+        job, created = self._admit(job, ('report', report_date, config_name, data_versions.current()))
+        if created:
+            job.events('queued', report_date=report_date.isoformat())
+            self._get_executor().submit(self._run, job)
+            print(f"📨 Задание на отчет {job.id} ({report_date.strftime('%d.%m.%Y')}) поставлено в очередь")
+        return job
+
+    def submit_batch(self, date_from: date, date_to: date, output: str = 'zip', generated_by: str = 'batch',
+                     config_name: str = SUMMARY_REPORT_NAME) -> ReportJob:
+        """Пакет отчетов за диапазон дат; ход - 'Отчеты: N/M'"""
+        self._prune()
+        job = ReportJob(date_from, generated_by, config_name)
+        job.date_to = date_to
+        job.output = output
+        job, created = self._admit(job, ('batch', date_from, date_to, output, config_name, data_versions.current()))
+        if created:
+            job.events('queued', report_date=date_from.isoformat(), date_to=date_to.isoformat())
+            self._get_executor().submit(self._run_batch, job)
+            print(f"📨 Пакет отчетов {job.id} ({date_from.strftime('%d.%m.%Y')} - {date_to.strftime('%d.%m.%Y')}) поставлен в очередь")
+        return job
+
+    def _admit(self, job: ReportJob, key: tuple):
+        """(задание, True) - новое принято; (идущее такое же, False); очередь заполнена - AdmissionRejected"""
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None:
+                running.joined += 1
+                print(f"🔗 Запрос присоединен к заданию {running.id} (всего присоединено: {running.joined})")
+                return running, False
+            pending = sum(1 for j in self._jobs.values() if j.finished_at is None)
+            if pending >= self.max_workers + self.queue_size:
+                raise AdmissionRejected('Очередь отчетов заполнена: повторите запрос позже', 429)
+            job.key = key
+            self._inflight[key] = job
+            self._jobs[job.id] = job
+            event_bus.open(job.id)
+            return job, True
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = [j for j in self._jobs.values() if j.finished_at is None]
+            return {'workers': self.max_workers, 'queue_size': self.queue_size,
+                    'running': sum(1 for j in pending if j.status == 'running'),
+                    'queued': sum(1 for j in pending if j.status == 'queued'),
+                    'joined': sum(j.joined for j in pending)}
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: ReportJob):
+        job.status = 'running'
+        job.events('start')
+        try:
+            report_path, cached = ReportCache(DatabaseQueries()).get_or_generate(
+                job.report_date, generated_by=job.generated_by, progress=job.update_progress,
+                config_name=job.config_name, events=job.events
+            )
+            job.filename = os.path.basename(report_path)
+            job.cached = cached
+            job.status = 'done'
+            self._finish_events(job)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'error'
+            job.events('error', error=job.error)
+        finally:
+            self._finish(job)
+            # Сессия scoped_session принадлежит потоку пула
+            db_connection.close_session()
+
+    def _run_batch(self, job: ReportJob):
+        job.status = 'running'
+        job.events('start')
+
+        def progress(name: str, done: int, total: int):
+            job.update_progress(name, done, total)
+            job.events('render', sheet=name, rows=done, total=total)
+
+        try:
+            result = ReportBatch(DatabaseQueries(), config_name=job.config_name).run(
+                job.report_date, job.date_to, output=job.output,
+                generated_by=job.generated_by, progress=progress
+            )
+            if result.get('zip_path'):
+                job.filename = os.path.basename(result.pop('zip_path'))
+            job.result = result
+            job.status = 'done'
+            self._finish_events(job)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'error'
+            job.events('error', error=job.error)
+        finally:
+            self._finish(job)
+            db_connection.close_session()
+
+    def _finish(self, job: ReportJob):
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            job.finished_at = datetime.now()
+        job._finished.set()
+
+    def _finish_events(self, job: ReportJob):
+        job.events('done', filename=job.filename, cached=job.cached, result=job.result,
+                   download_url=f'/download-report/{job.filename}' if job.filename else None)
+
+    def _prune(self):
+        cutoff = time.time() - Config.REPORT_JOB_TTL
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.finished_at and j.finished_at.timestamp() < cutoff]:
+                del self._jobs[job_id]
+
+# Общая очередь отчетов процесса
+report_jobs = ReportJobManager()
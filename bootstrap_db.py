@@ -0,0 +1,28 @@
+# bootstrap_db.py - инициализация БД: python bootstrap_db.py [--force] [--no-seed]
+import argparse
+import os
+import sys
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from database.bootstrap import bootstrap, schema_is_current
+
+def main():
+    parser = argparse.ArgumentParser(description='Создание таблиц, индексов и тестовых компаний')
+    parser.add_argument('--force', action='store_true', help='Выполнить, даже если схема актуальна')
+    parser.add_argument('--no-seed', action='store_true', help='Не добавлять тестовые компании')
+    parser.add_argument('--check', action='store_true', help='Только проверить схему (код выхода 1 - устарела)')
+    args = parser.parse_args()
+
+    current = schema_is_current()
+    if args.check:
+        print("✅ Схема БД актуальна" if current else "⚠️ Схема БД устарела")
+        sys.exit(0 if current else 1)
+    if current and not args.force:
+        print("✅ Схема БД актуальна, bootstrap не нужен (--force - выполнить принудительно)")
+        return
+    print(f"🛠️ Bootstrap БД: {bootstrap(seed=not args.no_seed)}")
+
+if __name__ == "__main__":
+    main()
@@ -46,4 +46,87 @@ class Config:
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024
     
     # Разрешенные расширения
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+    
+    # Режим записи повторных загрузок: 'diff' - построчное сравнение с историей в DataHistory,
+    # 'replace' - удаление и повторная вставка всех строк файла
+    INGEST_MODE = os.environ.get('INGEST_MODE') or 'diff'
+    
+    # Профилировщик SQL-запросов (/admin/db-profile). По умолчанию выключен: каждый запрос
+    # лишний раз проходит через хуки SQLAlchemy; включается DB_PROFILER=1 (для разработки)
+    DB_PROFILER_ENABLED = os.environ.get('DB_PROFILER', '0') == '1'
+    DB_PROFILER_CAPACITY = int(os.environ.get('DB_PROFILER_CAPACITY', 500))
+    
+    # Как часто (сек.) процесс перечитывает версии данных из БД, чтобы увидеть загрузки других воркеров
+    DATA_VERSION_TTL = float(os.environ.get('DATA_VERSION_TTL', 1.0))
+    
+    # Аналитика на DuckDB (необязательная зависимость): auto | sqlite | parquet | snapshot
+    # (parquet - только явно, каталог заполняет python export_parquet.py)
+    ANALYTICS_SOURCE = os.environ.get('ANALYTICS_SOURCE') or 'auto'
+    ANALYTICS_PARQUET_DIR = os.environ.get('ANALYTICS_PARQUET_DIR') or 'analytics_parquet'
+    ANALYTICS_THREADS = int(os.environ.get('ANALYTICS_THREADS', os.cpu_count() or 4))
+    
+    # Движок записи сводного отчета: 'openpyxl' (загрузка шаблона целиком), 'streaming' (write-only)
+    # или 'xml' (перезапись только sheetData в zip-архиве шаблона)
+    REPORT_BACKEND = os.environ.get('REPORT_BACKEND') or 'openpyxl'
+    
+    # Кэш готовых отчетов (generated_reports): срок хранения и общий объем файлов
+    REPORT_CACHE_MAX_AGE_DAYS = int(os.environ.get('REPORT_CACHE_MAX_AGE_DAYS', 7))
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_MB', 500)) * 1024 * 1024
+    
+    # Фоновая генерация отчетов: число потоков и сколько секунд хранить завершенные задания
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', 3600))
+    
+    # Рендер листов отчета в отдельных процессах (движок 'xml'); 0 - последовательно в текущем
+    REPORT_SHEET_PROCESSES = int(os.environ.get('REPORT_SHEET_PROCESSES', 0))
+    
+    # Пакетная генерация отчетов за диапазон дат: процессы рендера и предельная длина диапазона
+    REPORT_BATCH_PROCESSES = int(os.environ.get('REPORT_BATCH_PROCESSES', os.cpu_count() or 2))
+    REPORT_BATCH_MAX_DAYS = int(os.environ.get('REPORT_BATCH_MAX_DAYS', 366))
+    
+    # Кэш XML-частей листов: при новой загрузке перерисовываются только листы с измененными данными (движок 'xml')
+    REPORT_PARTS_DIR = os.environ.get('REPORT_PARTS_DIR') or 'report_parts'
+    
+    # Отдача отчетов фронт-прокси: '' - сам Flask, 'x-accel' - nginx (X-Accel-Redirect), 'x-sendfile' - Apache/lighttpd (X-Sendfile)
+    DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD') or ''
+    # internal-location nginx, отображаемый на папку REPORTS_FOLDER
+    DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX') or '/protected-reports/'
+    USE_X_SENDFILE = DOWNLOAD_OFFLOAD == 'x-sendfile'
+    
+    # Постраничные API: строк на странице по умолчанию и максимум (?limit=)
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+    API_PAGE_MAX = int(os.environ.get('API_PAGE_MAX', 1000))
+    
+    # Кэш ответов чтения API в памяти процесса (сбрасывается новой версией данных)
+    HTTP_CACHE_MAX_ENTRIES = int(os.environ.get('HTTP_CACHE_MAX_ENTRIES', 256))
+    
+    # Продакшн-сервер (gunicorn.conf.py): адрес, число процессов-воркеров и потоков в каждом, таймаут запроса
+    WEB_BIND = os.environ.get('WEB_BIND') or '0.0.0.0:5000'
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 120))
+    
+    # Создание/докатка схемы при старте, если модели изменились (иначе - только python bootstrap_db.py)
+    DB_AUTO_BOOTSTRAP = os.environ.get('DB_AUTO_BOOTSTRAP', '1') == '1'
+    
+    # События хода операций (SSE /events/<channel>): очередь клиента, хранимая история канала,
+    # время хранения канала без событий и подписчиков, интервал keep-alive и максимальная длительность потока, секунды
+    # (после нее браузер переподключается с Last-Event-ID); одновременных потоков в процессе - каждый занимает
+    # поток веб-сервера, поэтому не больше половины WEB_THREADS (сверх - 429, клиент опрашивает статус)
+    EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', 256))
+    EVENT_HISTORY = int(os.environ.get('EVENT_HISTORY', 200))
+    EVENT_CHANNEL_TTL = int(os.environ.get('EVENT_CHANNEL_TTL', 600))
+    EVENT_HEARTBEAT = int(os.environ.get('EVENT_HEARTBEAT', 15))
+    EVENT_STREAM_MAX_SECONDS = int(os.environ.get('EVENT_STREAM_MAX_SECONDS', 45))
+    EVENT_STREAMS_MAX = int(os.environ.get('EVENT_STREAMS_MAX', max(1, WEB_THREADS // 2)))
+    
+    # Ограничение тяжелых запросов в процессе: одновременных разборов загрузок, ожидающих в очереди
+    # и время ожидания места (сверх - 429/503 с Retry-After); очередь заданий отчетов сверх REPORT_WORKERS,
+    # ожидание синхронного отчета из админки, секунды
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 10))
+    UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', 2))
+    UPLOAD_QUEUE_SIZE = int(os.environ.get('UPLOAD_QUEUE_SIZE', 4))
+    UPLOAD_QUEUE_TIMEOUT = int(os.environ.get('UPLOAD_QUEUE_TIMEOUT', 30))
+    REPORT_QUEUE_SIZE = int(os.environ.get('REPORT_QUEUE_SIZE', 4))
+    REPORT_SYNC_TIMEOUT = int(os.environ.get('REPORT_SYNC_TIMEOUT', 120))
\ No newline at end of file
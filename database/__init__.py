@@ -4,7 +4,8 @@ from .models import (
     Base, Company, UploadedFile, 
     Sheet1Structure, Sheet2Demand, Sheet3Balance,
     Sheet4Supply, Sheet5Sales, DataHistory,
-    ReportConfig, GeneratedReport
+    ReportConfig, GeneratedReport,
+    FuelLocation, FuelFact, DataVersion
 )
 
 # Экспортируем основные объекты
@@ -20,5 +21,8 @@ __all__ = [
     'Sheet5Sales',
     'DataHistory',
     'ReportConfig',
-    'GeneratedReport'
+    'GeneratedReport',
+    'FuelLocation',
+    'FuelFact',
+    'DataVersion'
 ]
\ No newline at end of file
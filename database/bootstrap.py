@@ -0,0 +1,109 @@
+# database/bootstrap.py
+import zlib
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from .connection import db_connection
+from .models import Base, Company, DataVersion, FuelFact
+from .versioning import data_versions
+
+# Строка data_versions, в которой хранится отпечаток схемы последнего bootstrap
+SCHEMA_SCOPE = 'schema'
+
+TEST_COMPANIES = [
+    ("Саханефтегазсбыт", "СНГС"),
+    ("Туймаада-Нефть", "ТУЙМААДА"),
+    ("Сибойл", "СИБОЙЛ"),
+    ("ЭКТО-Ойл", "ЭКТО"),
+    ("Сибирское топливо", "СИБТОП"),
+    ("Паритет", "ПАРИТЕТ")
+]
+
+def schema_fingerprint() -> int:
+    """Отпечаток схемы моделей: таблицы, колонки и индексы.
+
+    Считается по метаданным без обращения к БД и меняется при любой
+    правке моделей, поэтому номер версии схемы не нужно вести вручную.
+    """
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f'{c.name}:{c.type}:{c.nullable}' for c in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    # Положительное 32-битное число - помещается в Integer любой СУБД
+    return zlib.crc32('|'.join(parts).encode('utf-8')) & 0x7fffffff
+
+def schema_is_current() -> bool:
+    """Схема БД соответствует моделям (один запрос по первичному ключу)"""
+    session = db_connection.session_factory()
+    try:
+        row = session.get(DataVersion, SCHEMA_SCOPE)
+        return row is not None and row.version == schema_fingerprint()
+    except SQLAlchemyError:
+        # Таблицы data_versions еще нет - база не инициализирована
+        return False
+    finally:
+        session.close()
+
+def bootstrap(seed: bool = True) -> dict:
+    """Создание таблиц, докатка колонок и индексов, тестовые компании и отпечаток схемы"""
+    db_connection.create_tables()
+    backfilled = backfill_fuel_facts()
+    fingerprint = schema_fingerprint()
+    session = db_connection.session_factory()
+    try:
+        seeded = 0
+        if seed and session.query(Company.id).first() is None:
+            for name, code in TEST_COMPANIES:
+                session.add(Company(name=name, code=code))
+            seeded = len(TEST_COMPANIES)
+            # Кэш списка компаний и ETag /api/companies привязаны к версии таблицы
+            data_versions.bump(session, Company.__tablename__)
+            print("Тестовые компании добавлены")
+
+        row = session.get(DataVersion, SCHEMA_SCOPE)
+        if row is None:
+            session.add(DataVersion(scope=SCHEMA_SCOPE, version=fingerprint))
+        else:
+            row.version = fingerprint
+        session.commit()
+        return {'schema': fingerprint, 'companies_seeded': seeded, 'fuel_facts_backfilled': backfilled}
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def backfill_fuel_facts() -> int:
+    """Заполнение fuel_facts в базе, где листы загружались до появления таблицы фактов.
+
+    Без этого /api/fuel-totals и аналитика по фактам отдают нули, пока
+    кто-то вручную не вызовет /admin/rebuild-fuel-facts.
+    """
+    from .queries import DatabaseQueries, FACT_COLUMNS
+    session = db_connection.session_factory()
+    try:
+        if session.query(FuelFact.id).first() is not None:
+            return 0
+        if not any(session.query(model.id).first() is not None for model in FACT_COLUMNS):
+            return 0
+    finally:
+        session.close()
+    facts = DatabaseQueries().rebuild_fuel_facts()
+    print(f"📊 Таблица фактов заполнена из листов: {facts} строк")
+    return facts
+
+def ensure_schema(auto: bool = None) -> bool:
+    """Проверка схемы при старте процесса; bootstrap - только если модели изменились.
+
+    При auto=False (Config.DB_AUTO_BOOTSTRAP) устаревшая схема не трогается,
+    а в лог пишется подсказка запустить bootstrap_db.py. Возвращает True,
+    если схема актуальна.
+    """
+    auto = Config.DB_AUTO_BOOTSTRAP if auto is None else auto
+    if schema_is_current():
+        return True
+    if not auto:
+        print("⚠️ Схема БД устарела или не создана: выполните python bootstrap_db.py")
+        return False
+    print(f"🛠️ Схема БД изменилась - bootstrap: {bootstrap()}")
+    return True
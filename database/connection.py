@@ -1,5 +1,5 @@
 # database/connection.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, scoped_session
 from config import Config
 
@@ -15,12 +15,44 @@ class DatabaseConnection:
     def close_session(self):
         self.Session.remove()
     
+    def dispose_after_fork(self):
+        """Новый пул соединений в дочернем процессе (gunicorn post_fork).
+        
+        Соединения, открытые мастером при preload, остаются ему: close=False
+        не закрывает их, а только забывает в дочернем процессе.
+        """
+        self.Session.remove()
+        self.engine.dispose(close=False)
+    
     def create_tables(self):
         """Создание всех таблиц в базе данных"""
         from .models import Base
         Base.metadata.create_all(self.engine)
+        self.upgrade_schema(Base.metadata)
         print("Таблицы базы данных созданы успешно")
     
+    def upgrade_schema(self, metadata):
+        """Добавление новых колонок и индексов в уже существующие таблицы.
+        
+        create_all создает только отсутствующие таблицы; новые nullable-колонки
+        и индексы моделей докатываются здесь через ALTER TABLE / CREATE INDEX.
+        """
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        with self.engine.begin() as conn:
+            for table in metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                columns = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in columns or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    print(f"🔧 {table.name}: добавлена колонка {column.name}")
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+    
     def drop_tables(self):
         """Удаление всех таблиц (для тестирования)"""
         from .models import Base
@@ -0,0 +1,154 @@
+# database/file_catalog.py
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+from config import Config
+from .connection import db_connection
+from .models import GeneratedReport, UploadedFile
+
+# Статусы отчетов, файлы которых можно скачать ('archive' - zip пакета отчетов)
+DOWNLOADABLE_STATUSES = ('generated', 'archive')
+REPORT_EXTENSIONS = ('.xlsx', '.zip')
+
+def file_checksum(path: str) -> str:
+    """SHA-256 файла, читается блоками по 1 МБ"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def describe_file(path: str) -> dict:
+    """Поля каталога для файла: абсолютный путь, имя, размер и контрольная сумма"""
+    abs_path = os.path.abspath(path)
+    return {
+        'file_path': abs_path,
+        'file_name': os.path.basename(abs_path),
+        'file_size': os.path.getsize(abs_path),
+        'checksum': file_checksum(abs_path),
+    }
+
+def _local_path(path: str) -> str:
+    """Путь, записанный под Windows ('uploads\\file.xlsx'), в разделителях текущей ОС"""
+    if os.path.exists(path) or '\\' not in path:
+        return path
+    return path.replace('\\', os.sep)
+
+class FileCatalog:
+    """Каталог отчетов и загрузок в БД (generated_reports, uploaded_files).
+
+    Файлы регистрируются при создании, скачивание находит путь одним
+    запросом по индексу имени. Файловая система просматривается только
+    явной сверкой reconcile(): пропавшие файлы помечаются, неучтенные
+    отчеты добавляются, размеры и контрольные суммы обновляются.
+    """
+
+    def find_report(self, filename: str):
+        """Запись каталога (file_path, checksum, file_size, generated_at) по имени файла или None"""
+        session = db_connection.session_factory()
+        try:
+            return session.query(
+                GeneratedReport.file_path, GeneratedReport.checksum,
+                GeneratedReport.file_size, GeneratedReport.generated_at
+            ).filter(
+                GeneratedReport.file_name == filename,
+                GeneratedReport.status.in_(DOWNLOADABLE_STATUSES)
+            ).order_by(GeneratedReport.generated_at.desc()).first()
+        finally:
+            session.close()
+
+    def list_reports(self, limit: int = 100) -> List[Dict[str, Any]]:
+        session = db_connection.session_factory()
+        try:
+            reports = session.query(GeneratedReport).filter(
+                GeneratedReport.status.in_(DOWNLOADABLE_STATUSES)
+            ).order_by(GeneratedReport.generated_at.desc()).limit(limit).all()
+            return [{
+                'filename': r.file_name or os.path.basename(r.file_path),
+                'path': r.file_path,
+                'size': r.file_size,
+                'checksum': r.checksum,
+                'report_date': r.report_date.isoformat() if r.report_date else None,
+                'modified': r.generated_at.strftime('%d.%m.%Y %H:%M') if r.generated_at else None,
+                'status': r.status,
+            } for r in reports]
+        finally:
+            session.close()
+
+    def reconcile(self, reports_dir: str = None, uploads_dir: str = None) -> Dict[str, Any]:
+        """Сверка каталога с диском (явный запуск из админки)"""
+        reports_dir = os.path.abspath(reports_dir or Config.REPORTS_FOLDER)
+        uploads_dir = os.path.abspath(uploads_dir or Config.UPLOAD_FOLDER)
+        stats = {'reports_missing': 0, 'reports_updated': 0, 'reports_added': 0,
+                 'uploads_missing': [], 'uploads_updated': 0, 'uploads_unregistered': []}
+        session = db_connection.session_factory()
+        try:
+            known = set()
+            for report in session.query(GeneratedReport).filter(GeneratedReport.status.in_(DOWNLOADABLE_STATUSES)):
+                if not os.path.exists(_local_path(report.file_path)):
+                    report.status = 'missing'
+                    stats['reports_missing'] += 1
+                    continue
+                if self._refresh(report):
+                    stats['reports_updated'] += 1
+                known.add(report.file_path)
+
+            for entry in self._scan(reports_dir, REPORT_EXTENSIONS):
+                if entry.path in known:
+                    continue
+                info = describe_file(entry.path)
+                session.add(GeneratedReport(
+                    report_date=datetime.fromtimestamp(entry.stat().st_mtime).date(),
+                    generated_by='reconcile',
+                    generated_at=datetime.fromtimestamp(entry.stat().st_mtime),
+                    status='archive' if entry.name.endswith('.zip') else 'generated',
+                    **info
+                ))
+                stats['reports_added'] += 1
+
+            registered = set()
+            for upload in session.query(UploadedFile):
+                if not os.path.exists(_local_path(upload.file_path)):
+                    stats['uploads_missing'].append(upload.filename)
+                    continue
+                if self._refresh(upload):
+                    stats['uploads_updated'] += 1
+                registered.add(upload.file_path)
+            # Незарегистрированные загрузки нужно разобрать заново (компания и дата - из файла)
+            stats['uploads_unregistered'] = [e.name for e in self._scan(uploads_dir, ('.xlsx', '.xls'))
+                                             if e.path not in registered]
+
+            session.commit()
+            print(f"🗂️ Сверка каталога файлов: {stats}")
+            return stats
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _refresh(self, row) -> bool:
+        """Абсолютный путь, размер и контрольная сумма записи; True, если что-то изменилось"""
+        abs_path = os.path.abspath(_local_path(row.file_path))
+        size = os.path.getsize(abs_path)
+        changed = abs_path != row.file_path or size != row.file_size or not row.checksum
+        if isinstance(row, GeneratedReport) and row.file_name != os.path.basename(abs_path):
+            changed = True
+        if changed:
+            info = describe_file(abs_path)
+            row.file_path = info['file_path']
+            row.file_size = info['file_size']
+            row.checksum = info['checksum']
+            if isinstance(row, GeneratedReport):
+                row.file_name = info['file_name']
+        return changed
+
+    def _scan(self, directory: str, extensions: tuple):
+        if not os.path.isdir(directory):
+            return []
+        return [entry for entry in os.scandir(directory)
+                if entry.is_file() and entry.name.lower().endswith(extensions)]
+
+# Общий каталог файлов
+file_catalog = FileCatalog()
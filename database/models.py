@@ -1,5 +1,5 @@
 # database/models.py
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Date, DateTime, Boolean, Text, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -30,10 +30,15 @@ class UploadedFile(Base):
     file_size = Column(Integer)
     status = Column(String(50), default='uploaded')
     error_message = Column(Text)
+    # SHA-256 содержимого (каталог файлов, сверка с диском)
+    checksum = Column(String(64))
     
     company = relationship("Company", back_populates="uploaded_files")
     
     __table_args__ = (
+        Index('ix_uploaded_files_filename', 'filename'),
+        # Постраничная выдача последних файлов (keyset по upload_date, id)
+        Index('ix_uploaded_files_upload_date', 'upload_date', 'id'),
         {'sqlite_autoincrement': True},
     )
 
@@ -52,6 +57,11 @@ class Sheet1Structure(Base):
     working_azs_count = Column(Integer)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet1_structure_company_date', 'company_id', 'report_date'),
+    )
 
 class Sheet2Demand(Base):
     __tablename__ = 'sheet2_demand'
@@ -88,6 +98,11 @@ class Sheet2Demand(Base):
     monthly_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet2_demand_company_date', 'company_id', 'report_date'),
+    )
 
 class Sheet3Balance(Base):
     __tablename__ = 'sheet3_balance'
@@ -133,6 +148,11 @@ class Sheet3Balance(Base):
     capacity_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet3_balance_company_date', 'company_id', 'report_date'),
+    )
 
 class Sheet4Supply(Base):
     __tablename__ = 'sheet4_supply'
@@ -157,6 +177,11 @@ class Sheet4Supply(Base):
     supply_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet4_supply_company_date', 'company_id', 'report_date'),
+    )
 
 class Sheet5Sales(Base):
     __tablename__ = 'sheet5_sales'
@@ -192,6 +217,11 @@ class Sheet5Sales(Base):
     monthly_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet5_sales_company_date', 'company_id', 'report_date'),
+    )
 # В models.py добавляем эти классы после Sheet5Sales:
 
 class Sheet6Aviation(Base):
@@ -214,6 +244,11 @@ class Sheet6Aviation(Base):
     end_of_day_balance = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet6_aviation_company_date', 'company_id', 'report_date'),
+    )
 
 class Sheet7Comments(Base):
     __tablename__ = 'sheet7_comments'
@@ -228,6 +263,71 @@ class Sheet7Comments(Base):
     comments = Column(Text)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    # Выборка последних строк компании на дату (as-of)
+    __table_args__ = (
+        Index('ix_sheet7_comments_company_date', 'company_id', 'report_date'),
+    )
+
+# Измерения узкой таблицы фактов: целочисленные ключи показателей и видов топлива
+FUEL_METRICS = {
+    1: 'stock',
+    2: 'transit',
+    3: 'capacity',
+    4: 'supply',
+    5: 'daily_sales',
+    6: 'monthly_sales',
+}
+
+FUEL_TYPES = {
+    1: 'ai76_80',
+    2: 'ai92',
+    3: 'ai95',
+    4: 'ai98_100',
+    5: 'diesel_winter',
+    6: 'diesel_arctic',
+    7: 'diesel_summer',
+    8: 'diesel_intermediate',
+}
+
+class FuelLocation(Base):
+    """Измерение объектов (нефтебаз/АЗС) для таблицы фактов"""
+    __tablename__ = 'fuel_locations'
+    
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey('companies.id'), nullable=False)
+    name = Column(String(500), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('company_id', 'name', name='uq_fuel_locations_company_name'),
+    )
+
+class FuelFact(Base):
+    """Узкая таблица фактов: одна строка на (дата, компания, объект, показатель, топливо)"""
+    __tablename__ = 'fuel_facts'
+    
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey('uploaded_files.id'), nullable=False)
+    report_date = Column(Date, nullable=False)
+    company_id = Column(Integer, ForeignKey('companies.id'), nullable=False)
+    location_id = Column(Integer, ForeignKey('fuel_locations.id'))
+    metric_id = Column(SmallInteger, nullable=False)
+    fuel_type_id = Column(SmallInteger, nullable=False)
+    value = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        # Покрывающий индекс: GROUP BY по показателю/топливу/периоду/компании без обращения к таблице
+        Index('ix_fuel_facts_covering', 'metric_id', 'fuel_type_id', 'report_date', 'company_id', 'value'),
+        Index('ix_fuel_facts_file_metric', 'file_id', 'metric_id'),
+    )
+
+class DataVersion(Base):
+    """Монотонные счетчики версии данных ('global' и по таблицам), увеличиваются при загрузке"""
+    __tablename__ = 'data_versions'
+    
+    scope = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
 class DataHistory(Base):
     __tablename__ = 'data_history'
@@ -263,6 +363,16 @@ class GeneratedReport(Base):
     generated_by = Column(String(100))
     generated_at = Column(DateTime, default=datetime.now)
     status = Column(String(50), default='generated')
+    # Глобальная версия данных, на которой построен отчет (ключ кэша отчетов)
+    data_version = Column(Integer)
+    # Каталог файлов: имя для скачивания и SHA-256 содержимого
+    file_name = Column(String(500))
+    checksum = Column(String(64))
+    
+    __table_args__ = (
+        Index('ix_generated_reports_lookup', 'report_config_id', 'report_date', 'data_version'),
+        Index('ix_generated_reports_file_name', 'file_name'),
+    )
     
 class ConsolidatedData(Base):
     """Модель для хранения сводных данных по компаниям"""
@@ -0,0 +1,169 @@
+# database/profiler.py
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any
+from sqlalchemy import event
+from config import Config
+
+class QueryProfiler:
+    """Профилировщик SQL-запросов в разрезе HTTP-запросов.
+
+    Хуки на engine собирают отпечаток запроса, длительность и число строк.
+    Итоги по каждому HTTP-запросу хранятся в кольцевом буфере ограниченного
+    размера; повторы одного и того же SELECT внутри запроса помечаются как N+1.
+    """
+
+    _LITERALS = [
+        (re.compile(r"'(?:[^']|'')*'"), '?'),
+        (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+        (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+        (re.compile(r'\s+'), ' '),
+    ]
+
+    def __init__(self, capacity: int = 500, n_plus_one_threshold: int = 3):
+        self.requests = deque(maxlen=capacity)
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._installed = set()
+
+    def install(self, engine):
+        """Подключение хуков к engine (повторный вызов ничего не делает)"""
+        if id(engine) in self._installed:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        self._installed.add(id(engine))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._installed)
+
+    def fingerprint(self, statement: str) -> str:
+        """Отпечаток запроса: литералы и списки параметров заменены на '?'"""
+        for pattern, replacement in self._LITERALS:
+            statement = pattern.sub(replacement, statement)
+        return statement.strip()
+
+    # ------------------------------------------------------------------
+    # Границы HTTP-запроса
+    # ------------------------------------------------------------------
+    def start_request(self, route: str, method: str, path: str):
+        self._local.current = {
+            'route': route,
+            'method': method,
+            'path': path,
+            'started_at': datetime.now(),
+            'started': time.perf_counter(),
+            'statements': {},
+        }
+
+    def finish_request(self, status: int = None):
+        current = getattr(self._local, 'current', None)
+        self._local.current = None
+        if current is None:
+            return
+
+        statements = current.pop('statements')
+        duration_ms = (time.perf_counter() - current.pop('started')) * 1000
+        current.update({
+            'status': status,
+            'duration_ms': round(duration_ms, 3),
+            'db_time_ms': round(sum(s['total_ms'] for s in statements.values()), 3),
+            'statement_count': sum(s['count'] for s in statements.values()),
+            'statements': sorted(statements.values(), key=lambda s: s['total_ms'], reverse=True),
+            'n_plus_one': [
+                {'fingerprint': s['fingerprint'], 'count': s['count'], 'total_ms': s['total_ms']}
+                for s in statements.values()
+                if s['count'] >= self.n_plus_one_threshold and s['fingerprint'].upper().startswith('SELECT')
+            ],
+        })
+        with self._lock:
+            self.requests.append(current)
+
+    # ------------------------------------------------------------------
+    # Хуки engine
+    # ------------------------------------------------------------------
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'current', None) is not None:
+            conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        current = getattr(self._local, 'current', None)
+        starts = conn.info.get('profiler_start')
+        if current is None or not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+
+        fingerprint = self.fingerprint(statement)
+        stats = current['statements'].get(fingerprint)
+        if stats is None:
+            stats = current['statements'][fingerprint] = {
+                'fingerprint': fingerprint, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0
+            }
+        stats['count'] += 1
+        stats['total_ms'] = round(stats['total_ms'] + elapsed_ms, 3)
+        stats['max_ms'] = round(max(stats['max_ms'], elapsed_ms), 3)
+        # Для SELECT драйвер sqlite не сообщает rowcount (-1)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            stats['rows'] += cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Отчет
+    # ------------------------------------------------------------------
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """Самые медленные запросы, N+1 и худший HTTP-запрос по каждому маршруту"""
+        with self._lock:
+            requests = list(self.requests)
+
+        slowest = {}
+        worst_by_route = {}
+        n_plus_one = {}
+        for req in requests:
+            for s in req['statements']:
+                agg = slowest.get(s['fingerprint'])
+                if agg is None:
+                    agg = slowest[s['fingerprint']] = {
+                        'fingerprint': s['fingerprint'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0
+                    }
+                agg['count'] += s['count']
+                agg['total_ms'] = round(agg['total_ms'] + s['total_ms'], 3)
+                agg['max_ms'] = max(agg['max_ms'], s['max_ms'])
+                agg['rows'] += s['rows']
+
+            route = f"{req['method']} {req['route']}"
+            worst = worst_by_route.get(route)
+            if worst is None or req['duration_ms'] > worst['duration_ms']:
+                worst_by_route[route] = req
+
+            for item in req['n_plus_one']:
+                key = (route, item['fingerprint'])
+                if key not in n_plus_one or item['count'] > n_plus_one[key]['count']:
+                    n_plus_one[key] = {'route': route, **item}
+
+        return {
+            'requests_recorded': len(requests),
+            'capacity': self.requests.maxlen,
+            'slowest_statements': sorted(slowest.values(), key=lambda s: s['max_ms'], reverse=True)[:limit],
+            'worst_requests': [
+                self._request_summary(req, limit)
+                for req in sorted(worst_by_route.values(), key=lambda r: r['duration_ms'], reverse=True)
+            ],
+            'n_plus_one': sorted(n_plus_one.values(), key=lambda s: s['count'], reverse=True)[:limit],
+        }
+
+    def _request_summary(self, req: Dict, limit: int) -> Dict[str, Any]:
+        summary = {k: v for k, v in req.items() if k != 'statements'}
+        summary['started_at'] = req['started_at'].isoformat()
+        summary['statements'] = req['statements'][:limit]
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+
+# Глобальный профилировщик (хуки подключаются в create_app)
+query_profiler = QueryProfiler(capacity=Config.DB_PROFILER_CAPACITY)
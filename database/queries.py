@@ -1,10 +1,81 @@
 # database/queries.py - ПОЛНЫЙ ИСПРАВЛЕННЫЙ ФАЙЛ
 from .connection import db_connection
 from .models import *
-from datetime import datetime, date as dt_date
-from typing import List, Dict, Any
+from .versioning import data_versions, VersionedCache
+from .report_totals import add_report_totals
+from .file_catalog import describe_file
+from sqlalchemy import func, case, select, and_, tuple_
+from datetime import datetime, timedelta, date as dt_date
+from typing import List, Dict, Any, Optional, Tuple
+import base64
+import bisect
 import json
 import os
+from config import Config
+
+# Ключи, по которым строки повторной загрузки сопоставляются с сохраненными
+ROW_KEYS = {
+    Sheet1Structure: ('company_name',),
+    Sheet2Demand: (),
+    Sheet3Balance: ('location_name',),
+    Sheet4Supply: ('oil_depot_name', 'supply_date'),
+    Sheet5Sales: ('location_name',),
+    Sheet6Aviation: ('airport_name', 'tzk_name'),
+    Sheet7Comments: ('fuel_type', 'situation'),
+}
+
+# Таблицы листов по ключу листа
+SHEET_MODELS = {
+    'sheet1': Sheet1Structure,
+    'sheet2': Sheet2Demand,
+    'sheet3': Sheet3Balance,
+    'sheet4': Sheet4Supply,
+    'sheet5': Sheet5Sales,
+    'sheet6': Sheet6Aviation,
+    'sheet7': Sheet7Comments,
+}
+
+# Широкие колонки по видам топлива -> (колонка, показатель, топливо) узкой таблицы фактов
+_METRIC_IDS = {name: metric_id for metric_id, name in FUEL_METRICS.items()}
+_FUEL_TYPE_IDS = {name: fuel_type_id for fuel_type_id, name in FUEL_TYPES.items()}
+
+def _fact_columns(prefixes: Dict[str, str]) -> List[tuple]:
+    return [(f'{prefix}{fuel}', _METRIC_IDS[metric], fuel_type_id)
+            for metric, prefix in prefixes.items()
+            for fuel_type_id, fuel in FUEL_TYPES.items()]
+
+FACT_COLUMNS = {
+    Sheet3Balance: (_fact_columns({'stock': 'stock_', 'transit': 'transit_', 'capacity': 'capacity_'}), 'location_name'),
+    Sheet4Supply: (_fact_columns({'supply': 'supply_'}), 'oil_depot_name'),
+    Sheet5Sales: (_fact_columns({'daily_sales': 'daily_', 'monthly_sales': 'monthly_'}), 'location_name'),
+}
+
+FACT_GROUPS = {
+    'metric': FuelFact.metric_id,
+    'fuel_type': FuelFact.fuel_type_id,
+    'report_date': FuelFact.report_date,
+    'company': FuelFact.company_id,
+    'location': FuelFact.location_id,
+}
+
+def encode_cursor(*values) -> str:
+    """Непрозрачный курсор keyset-пагинации (значения ключа последней строки)"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('некорректный курсор')
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('некорректный курсор')
+    return values
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime, dt_date)) else value
+
+# Кэш результатов запросов, сбрасываемый при загрузке новых данных
+query_cache = VersionedCache(data_versions)
 
 class DatabaseQueries:
     def __init__(self):
@@ -78,6 +149,7 @@ class DatabaseQueries:
                 email_pattern=email_pattern
             )
             session.add(company)
+            data_versions.bump(session, Company.__tablename__)
             session.commit()
             return company
         except Exception as e:
@@ -121,6 +193,7 @@ class DatabaseQueries:
             if not company:
                 company = Company(name=normalized_name)
                 session.add(company)
+                data_versions.bump(session, Company.__tablename__)
                 session.commit()
                 print(f"   🆕 Создана новая компания: {normalized_name} (ID: {company.id})")
             
@@ -130,12 +203,19 @@ class DatabaseQueries:
                 UploadedFile.report_date == report_date
             ).first()
             
+            # Каталог файлов: абсолютный путь, размер и контрольная сумма
+            file_info = describe_file(file_path) if os.path.exists(file_path) else {'file_path': os.path.abspath(file_path), 'file_size': 0, 'checksum': None}
+            
             if existing:
                 # Обновляем существующий файл
                 existing.filename = filename
-                existing.file_path = file_path
+                existing.file_path = file_info['file_path']
+                existing.file_size = file_info['file_size']
+                existing.checksum = file_info['checksum']
                 existing.upload_date = datetime.now()
                 existing.status = 'processed'
+                data_versions.bump(session, UploadedFile.__tablename__)
+                session.commit()
                 file_id = existing.id
                 print(f"   📝 Обновлен существующий файл ID: {file_id}")
             else:
@@ -143,12 +223,14 @@ class DatabaseQueries:
                 uploaded_file = UploadedFile(
                     company_id=company.id,
                     filename=filename,
-                    file_path=file_path,
+                    file_path=file_info['file_path'],
                     report_date=report_date,
-                    file_size=os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+                    file_size=file_info['file_size'],
+                    checksum=file_info['checksum'],
                     status='processed'
                 )
                 session.add(uploaded_file)
+                data_versions.bump(session, UploadedFile.__tablename__)
                 session.commit()
                 file_id = uploaded_file.id
                 print(f"   📄 Создан новый файл ID: {file_id}")
@@ -163,25 +245,87 @@ class DatabaseQueries:
             self.db.close_session()
     
     def get_companies(self) -> List[Company]:
-        """Получение списка всех компаний"""
+        """Активные компании (кэшируются до изменения таблицы компаний)"""
+        return query_cache.get('companies', self._load_companies, scope=Company.__tablename__)
+
+    def _load_companies(self) -> List[Company]:
         session = self.db.get_session()
         try:
             return session.query(Company).filter(Company.is_active == True).all()
         finally:
             self.db.close_session()
     
+    def get_system_stats(self) -> Dict[str, Any]:
+        """Счетчики файлов и компаний одним агрегатным запросом (кэшируются до следующей загрузки)"""
+        return query_cache.get('system_stats', self._load_system_stats)
+
+    def _load_system_stats(self) -> Dict[str, Any]:
+        session = self.db.get_session()
+        try:
+            active_companies = session.query(func.count(Company.id)).filter(Company.is_active == True).scalar_subquery()
+            all_companies = session.query(func.count(Company.id)).scalar_subquery()
+            row = session.query(
+                func.count(UploadedFile.id),
+                func.coalesce(func.sum(case((UploadedFile.status == 'processed', 1), else_=0)), 0),
+                func.max(UploadedFile.upload_date),
+                active_companies,
+                all_companies,
+            ).one()
+            return {
+                'files_total': row[0],
+                'files_processed': row[1],
+                'last_upload': row[2],
+                'companies_active': row[3],
+                'companies_total': row[4],
+            }
+        finally:
+            self.db.close_session()
+
     def get_recent_files(self, limit: int = 10) -> List[Dict]:
         """Получение последних загруженных файлов"""
+        return self.get_recent_files_page(limit)[0]
+
+    def get_recent_files_page(self, limit: int = 20, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Страница последних файлов и курсор следующей.
+
+        Keyset по (upload_date, id) вместо OFFSET: следующая страница
+        начинается сразу после последней строки предыдущей по индексу
+        (сравнение кортежей, которое SQLite отдает в поиск по индексу).
+        Файлы без upload_date идут в конце списка по убыванию id.
+        """
         session = self.db.get_session()
         try:
-            files = session.query(
+            query = session.query(
                 UploadedFile,
                 Company.name.label('company_name')
             ).join(
                 Company, UploadedFile.company_id == Company.id
-            ).order_by(
-                UploadedFile.upload_date.desc()
-            ).limit(limit).all()
+            )
+            key = (UploadedFile.upload_date, UploadedFile.id)
+            after_date, after_id = decode_cursor(cursor) if cursor else (None, None)
+            
+            files = []
+            # Сначала файлы с датой загрузки (пока курсор не перешел к файлам без нее)
+            if after_id is None or after_date is not None:
+                dated = query.filter(UploadedFile.upload_date.isnot(None))
+                if after_date is not None:
+                    dated = dated.filter(tuple_(*key) < tuple_(datetime.fromisoformat(after_date), after_id))
+                files = dated.order_by(
+                    UploadedFile.upload_date.desc(), UploadedFile.id.desc()
+                ).limit(limit + 1).all()
+                after_id = None
+            # Затем (или если строк с датой не хватило) - файлы без даты загрузки
+            if len(files) <= limit:
+                undated = query.filter(UploadedFile.upload_date.is_(None))
+                if after_id is not None:
+                    undated = undated.filter(UploadedFile.id < after_id)
+                files += undated.order_by(UploadedFile.id.desc()).limit(limit + 1 - len(files)).all()
+            
+            next_cursor = None
+            if len(files) > limit:
+                files = files[:limit]
+                last = files[-1].UploadedFile
+                next_cursor = encode_cursor(last.upload_date.isoformat() if last.upload_date else None, last.id)
             
             return [
                 {
@@ -193,7 +337,7 @@ class DatabaseQueries:
                     'status': file.UploadedFile.status
                 }
                 for file in files
-            ]
+            ], next_cursor
         finally:
             self.db.close_session()
             
@@ -201,9 +345,9 @@ class DatabaseQueries:
         """Сохранение данных из листа 1"""
         session = self.db.get_session()
         try:
-            session.query(Sheet1Structure).filter(Sheet1Structure.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet1 = Sheet1Structure(
+                rows.append(dict(
                     file_id=file_id,
                     company_id=company_id,
                     report_date=report_date,
@@ -212,9 +356,10 @@ class DatabaseQueries:
                     oil_depots_count=item.get('oil_depots_count', 0),
                     azs_count=item.get('azs_count', 0),
                     working_azs_count=item.get('working_azs_count', 0)
-                )
-                session.add(sheet1)
+                ))
+            stats = self._store_sheet_rows(session, Sheet1Structure, file_id, rows)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -226,8 +371,7 @@ class DatabaseQueries:
         if not data: return
         session = self.db.get_session()
         try:
-            session.query(Sheet2Demand).filter(Sheet2Demand.file_id == file_id).delete()
-            sheet2 = Sheet2Demand(
+            rows = [dict(
                 file_id=file_id,
                 company_id=company_id,
                 report_date=report_date,
@@ -241,9 +385,10 @@ class DatabaseQueries:
                 monthly_gasoline_ai92=data.get('monthly_ai92', 0),
                 monthly_gasoline_ai95=data.get('monthly_ai95', 0),
                 monthly_diesel_total=data.get('monthly_diesel_total', 0),
-            )
-            session.add(sheet2)
+            )]
+            stats = self._store_sheet_rows(session, Sheet2Demand, file_id, rows)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -254,9 +399,9 @@ class DatabaseQueries:
         """Сохранение данных из листа 3"""
         session = self.db.get_session()
         try:
-            session.query(Sheet3Balance).filter(Sheet3Balance.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet3 = Sheet3Balance(
+                rows.append(dict(
                     file_id=file_id,
                     company_id=company_id,
                     report_date=report_date,
@@ -282,9 +427,11 @@ class DatabaseQueries:
                     capacity_diesel_winter=item.get('capacity_diesel_winter', 0),
                     capacity_diesel_arctic=item.get('capacity_diesel_arctic', 0),
                     capacity_diesel_summer=item.get('capacity_diesel_summer', 0),
-                )
-                session.add(sheet3)
+                ))
+            stats = self._store_sheet_rows(session, Sheet3Balance, file_id, rows)
+            self._store_fuel_facts(session, Sheet3Balance, file_id, company_id, report_date, rows, stats)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -295,9 +442,9 @@ class DatabaseQueries:
         """Сохранение данных из листа 4"""
         session = self.db.get_session()
         try:
-            session.query(Sheet4Supply).filter(Sheet4Supply.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet4 = Sheet4Supply(
+                rows.append(dict(
                     file_id=file_id,
                     company_id=company_id,
                     report_date=report_date,
@@ -310,9 +457,11 @@ class DatabaseQueries:
                     supply_diesel_winter=item.get('supply_diesel_winter', 0),
                     supply_diesel_arctic=item.get('supply_diesel_arctic', 0),
                     supply_diesel_summer=item.get('supply_diesel_summer', 0),
-                )
-                session.add(sheet4)
+                ))
+            stats = self._store_sheet_rows(session, Sheet4Supply, file_id, rows)
+            self._store_fuel_facts(session, Sheet4Supply, file_id, company_id, report_date, rows, stats)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -323,9 +472,9 @@ class DatabaseQueries:
         """Сохранение данных из листа 5"""
         session = self.db.get_session()
         try:
-            session.query(Sheet5Sales).filter(Sheet5Sales.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet5 = Sheet5Sales(
+                rows.append(dict(
                     file_id=file_id,
                     company_id=company_id,
                     report_date=report_date,
@@ -343,9 +492,11 @@ class DatabaseQueries:
                     monthly_diesel_winter=item.get('monthly_winter', 0),
                     monthly_diesel_arctic=item.get('monthly_arctic', 0),
                     monthly_diesel_summer=item.get('monthly_summer', 0),
-                )
-                session.add(sheet5)
+                ))
+            stats = self._store_sheet_rows(session, Sheet5Sales, file_id, rows)
+            self._store_fuel_facts(session, Sheet5Sales, file_id, company_id, report_date, rows, stats)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -355,18 +506,19 @@ class DatabaseQueries:
     def save_sheet6_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
         session = self.db.get_session()
         try:
-            session.query(Sheet6Aviation).filter(Sheet6Aviation.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet6 = Sheet6Aviation(
+                rows.append(dict(
                     file_id=file_id, company_id=company_id, report_date=report_date,
                     airport_name=item.get('airport', ''), tzk_name=item.get('tzk', ''),
                     contracts_info=item.get('contracts', ''), supply_week=item.get('supply_week', 0),
                     supply_month_start=item.get('supply_month_start', 0), monthly_demand=item.get('monthly_demand', 0),
                     consumption_week=item.get('consumption_week', 0), consumption_month_start=item.get('consumption_month_start', 0),
                     end_of_day_balance=item.get('end_of_day_balance', 0)
-                )
-                session.add(sheet6)
+                ))
+            stats = self._store_sheet_rows(session, Sheet6Aviation, file_id, rows)
             session.commit()
+            return stats
         except Exception as e:
             session.rollback()
             raise e
@@ -376,21 +528,332 @@ class DatabaseQueries:
     def save_sheet7_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
         session = self.db.get_session()
         try:
-            session.query(Sheet7Comments).filter(Sheet7Comments.file_id == file_id).delete()
+            rows = []
             for item in data:
-                sheet7 = Sheet7Comments(
+                rows.append(dict(
                     file_id=file_id, company_id=company_id, report_date=report_date,
                     fuel_type=item.get('fuel_type', ''), situation=item.get('situation', ''),
                     comments=item.get('comments', '')
-                )
-                session.add(sheet7)
+                ))
+            stats = self._store_sheet_rows(session, Sheet7Comments, file_id, rows)
+            session.commit()
+            return stats
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session()
+
+    def _store_sheet_rows(self, session, model, file_id: int, rows: List[Dict]) -> Dict[str, int]:
+        """Запись строк листа для файла в режиме Config.INGEST_MODE"""
+        if Config.INGEST_MODE == 'replace':
+            deleted = session.query(model).filter(model.file_id == file_id).delete()
+            session.add_all([model(**row) for row in rows])
+            stats = {'inserted': len(rows), 'updated': 0, 'deleted': deleted, 'unchanged': 0}
+        else:
+            stats = self._diff_sheet_rows(session, model, file_id, rows)
+        if stats['inserted'] or stats['updated'] or stats['deleted']:
+            data_versions.bump(session, model.__tablename__)
+        print(f"   🔁 {model.__tablename__}: +{stats['inserted']} ~{stats['updated']} -{stats['deleted']} ={stats['unchanged']}")
+        return stats
+
+    def _diff_sheet_rows(self, session, model, file_id: int, rows: List[Dict]) -> Dict[str, int]:
+        """Построчное сравнение повторной загрузки с сохраненными данными.
+
+        Строки сопоставляются по (file_id, ключ из ROW_KEYS); обновляются
+        только изменившиеся, новые добавляются, отсутствующие удаляются.
+        Каждое изменение пишется в DataHistory одной пачкой.
+        """
+        key_fields = ROW_KEYS[model]
+        existing = session.query(model).filter(model.file_id == file_id).order_by(model.id).all()
+        stored = dict(zip(self._row_keys([{f: getattr(obj, f) for f in key_fields} for obj in existing], key_fields), existing))
+        incoming = dict(zip(self._row_keys(rows, key_fields), rows))
+
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        history = []
+        inserted = []
+
+        for key, row in incoming.items():
+            obj = stored.pop(key, None)
+            if obj is None:
+                obj = model(**row)
+                session.add(obj)
+                inserted.append(obj)
+                stats['inserted'] += 1
+                continue
+
+            old_data, new_data = {}, {}
+            for field, value in row.items():
+                current = getattr(obj, field)
+                if current != value:
+                    old_data[field] = current
+                    new_data[field] = value
+                    setattr(obj, field, value)
+            if new_data:
+                history.append(self._history_entry(model, obj.id, 'UPDATE', file_id, old_data, new_data))
+                stats['updated'] += 1
+            else:
+                stats['unchanged'] += 1
+
+        for obj in stored.values():
+            old_data = {c.name: getattr(obj, c.name) for c in model.__table__.columns if c.name not in ('id', 'created_at')}
+            history.append(self._history_entry(model, obj.id, 'DELETE', file_id, old_data, None))
+            session.delete(obj)
+            stats['deleted'] += 1
+
+        if inserted:
+            # id новых строк нужны для истории
+            session.flush(inserted)
+            for obj in inserted:
+                new_data = {c.name: getattr(obj, c.name) for c in model.__table__.columns if c.name not in ('id', 'created_at')}
+                history.append(self._history_entry(model, obj.id, 'INSERT', file_id, None, new_data))
+
+        if history:
+            session.bulk_insert_mappings(DataHistory, history)
+        return stats
+
+    def _row_keys(self, rows: List[Dict], key_fields: tuple) -> List[tuple]:
+        """Ключи строк; повторяющиеся ключи различаются порядковым номером"""
+        seen = {}
+        keys = []
+        for row in rows:
+            base = tuple(self._normalize_key_part(row.get(f)) for f in key_fields)
+            seen[base] = seen.get(base, 0) + 1
+            keys.append(base + (seen[base],))
+        return keys
+
+    def _normalize_key_part(self, value):
+        if isinstance(value, str):
+            return value.strip().lower()
+        return value
+
+    def _history_entry(self, model, record_id: int, operation: str, file_id: int,
+                       old_data: Dict = None, new_data: Dict = None) -> Dict:
+        return {
+            'table_name': model.__tablename__,
+            'record_id': record_id,
+            'operation': operation,
+            'old_data': self._json_safe(old_data),
+            'new_data': self._json_safe(new_data),
+            'changed_by': f'ingest:file_{file_id}',
+            'changed_at': datetime.now(),
+        }
+
+    def _json_safe(self, data: Dict):
+        if data is None:
+            return None
+        return {k: v.isoformat() if isinstance(v, (datetime, dt_date)) else v for k, v in data.items()}
+
+    def _store_fuel_facts(self, session, model, file_id: int, company_id: int, report_date: dt_date,
+                          rows: List[Dict], stats: Dict[str, int] = None):
+        """Перезапись строк узкой таблицы фактов для листа файла.
+
+        stats - итог записи строк листа: если повторная загрузка ничего
+        не изменила, факты остаются как есть.
+        """
+        if stats is not None and not (stats['inserted'] or stats['updated'] or stats['deleted']):
+            return
+        columns, location_field = FACT_COLUMNS[model]
+        metric_ids = {metric_id for _, metric_id, _ in columns}
+        session.query(FuelFact).filter(
+            FuelFact.file_id == file_id,
+            FuelFact.metric_id.in_(metric_ids)
+        ).delete(synchronize_session=False)
+
+        location_ids = self._get_location_ids(session, company_id, {row.get(location_field) or '' for row in rows})
+        facts = []
+        for row in rows:
+            location_id = location_ids[self._normalize_key_part(row.get(location_field) or '')]
+            for column, metric_id, fuel_type_id in columns:
+                value = row.get(column)
+                if value is None:
+                    continue
+                facts.append({
+                    'file_id': file_id,
+                    'report_date': report_date,
+                    'company_id': company_id,
+                    'location_id': location_id,
+                    'metric_id': metric_id,
+                    'fuel_type_id': fuel_type_id,
+                    'value': value,
+                })
+        if facts:
+            session.bulk_insert_mappings(FuelFact, facts)
+        if stats is not None:
+            # Полное перестроение (rebuild_fuel_facts) повышает версию один раз в конце
+            data_versions.bump(session, FuelFact.__tablename__)
+
+    def _get_location_ids(self, session, company_id: int, names: set) -> Dict[str, int]:
+        """id объектов компании по нормализованному имени (как в ключах строк), недостающие создаются"""
+        locations = {}
+        for loc in session.query(FuelLocation).filter(FuelLocation.company_id == company_id).order_by(FuelLocation.id):
+            # Объекты, созданные до нормализации, сводятся к первому
+            locations.setdefault(self._normalize_key_part(loc.name), loc.id)
+        missing = {}
+        for name in names:
+            key = self._normalize_key_part(name)
+            if key not in locations and key not in missing:
+                missing[key] = FuelLocation(company_id=company_id, name=name.strip())
+        if missing:
+            session.add_all(missing.values())
+            session.flush(list(missing.values()))
+            locations.update({key: loc.id for key, loc in missing.items()})
+            data_versions.bump(session, FuelLocation.__tablename__)
+        return locations
+
+    def rebuild_fuel_facts(self) -> int:
+        """Полное заполнение таблицы фактов из широких таблиц листов 3-5"""
+        session = self.db.get_session()
+        try:
+            session.query(FuelFact).delete(synchronize_session=False)
+            for model in FACT_COLUMNS:
+                columns = [c.name for c in model.__table__.columns]
+                batches = {}
+                for obj in session.query(model).order_by(model.id):
+                    key = (obj.file_id, obj.company_id, obj.report_date)
+                    batches.setdefault(key, []).append({c: getattr(obj, c) for c in columns})
+                for (file_id, company_id, report_date), rows in batches.items():
+                    self._store_fuel_facts(session, model, file_id, company_id, report_date, rows)
+            data_versions.bump(session, FuelFact.__tablename__)
             session.commit()
+            return session.query(FuelFact).count()
         except Exception as e:
             session.rollback()
             raise e
         finally:
             self.db.close_session()
 
+    def get_fuel_totals(self, metrics: List[str] = None, fuel_types: List[str] = None,
+                        date_from: dt_date = None, date_to: dt_date = None, company_id: int = None,
+                        group_by: tuple = ('metric', 'fuel_type')) -> List[Dict]:
+        """Агрегаты по узкой таблице фактов одним GROUP BY"""
+        session = self.db.get_session()
+        try:
+            group_columns = [FACT_GROUPS[g] for g in group_by]
+            query = session.query(*group_columns, func.sum(FuelFact.value), func.count())
+            if metrics:
+                query = query.filter(FuelFact.metric_id.in_([_METRIC_IDS[m] for m in metrics]))
+            if fuel_types:
+                query = query.filter(FuelFact.fuel_type_id.in_([_FUEL_TYPE_IDS[f] for f in fuel_types]))
+            if date_from:
+                query = query.filter(FuelFact.report_date >= date_from)
+            if date_to:
+                query = query.filter(FuelFact.report_date <= date_to)
+            if company_id:
+                query = query.filter(FuelFact.company_id == company_id)
+            rows = query.group_by(*group_columns).order_by(*group_columns).all()
+
+            companies = {}
+            if 'company' in group_by:
+                companies = dict(session.query(Company.id, Company.name).all())
+            locations = {}
+            if 'location' in group_by:
+                locations = dict(session.query(FuelLocation.id, FuelLocation.name).all())
+
+            labels = {
+                'metric': FUEL_METRICS.get,
+                'fuel_type': FUEL_TYPES.get,
+                'report_date': lambda d: d.isoformat() if d else None,
+                'company': companies.get,
+                'location': locations.get,
+            }
+            result = []
+            for row in rows:
+                item = {g: labels[g](row[i]) for i, g in enumerate(group_by)}
+                item['value'] = row[-2]
+                item['count'] = row[-1]
+                result.append(item)
+            return result
+        finally:
+            self.db.close_session()
+
+    def iter_sheet_batches(self, sheet: str, date_from: dt_date = None, date_to: dt_date = None,
+                           company_id: int = None, batch_size: int = 1000):
+        """Потоковое чтение строк листа пачками (серверный курсор, yield_per).
+
+        Первым элементом возвращается список колонок, затем списки кортежей.
+        Сессия живет, пока генератор не исчерпан или не закрыт.
+        """
+        model = SHEET_MODELS[sheet]
+        columns = list(model.__table__.columns)
+        query = select(*columns).order_by(model.report_date, model.id)
+        if date_from:
+            query = query.where(model.report_date >= date_from)
+        if date_to:
+            query = query.where(model.report_date <= date_to)
+        if company_id:
+            query = query.where(model.company_id == company_id)
+
+        session = self.db.session_factory()
+        try:
+            yield columns
+            result = session.execute(query.execution_options(yield_per=batch_size, stream_results=True))
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+        finally:
+            session.close()
+
+    def get_sheet_rows(self, sheet: str, company_id: int = None, date_from: dt_date = None, date_to: dt_date = None,
+                       columns: List[str] = None, limit: int = 100, cursor: str = None) -> Dict[str, Any]:
+        """Страница строк листа в колоночном виде: {колонка: [значения]} и курсор следующей.
+
+        Порядок (report_date, id), keyset вместо OFFSET - глубокие страницы
+        стоят столько же, сколько первая.
+        """
+        model = SHEET_MODELS[sheet]
+        table_columns = model.__table__.columns
+        names = columns or [c.name for c in table_columns]
+        unknown = [name for name in names if name not in table_columns]
+        if unknown:
+            raise ValueError(f"неизвестные колонки: {', '.join(unknown)}")
+        # Ключ курсора нужен в каждой строке
+        selected = list(dict.fromkeys([*names, 'report_date', 'id']))
+
+        query = select(*(table_columns[name] for name in selected))
+        if date_from:
+            query = query.where(model.report_date >= date_from)
+        if date_to:
+            query = query.where(model.report_date <= date_to)
+        if company_id:
+            query = query.where(model.company_id == company_id)
+        if cursor:
+            report_date, row_id = decode_cursor(cursor)
+            report_date = dt_date.fromisoformat(report_date)
+            query = query.where(tuple_(model.report_date, model.id) > tuple_(report_date, row_id))
+        query = query.order_by(model.report_date, model.id).limit(limit + 1)
+
+        session = self.db.session_factory()
+        try:
+            rows = session.execute(query).all()
+        finally:
+            session.close()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].report_date.isoformat(), rows[-1].id)
+        positions = {name: i for i, name in enumerate(selected)}
+        return {
+            'sheet': sheet,
+            'count': len(rows),
+            'columns': names,
+            'data': {name: [_json_value(row[positions[name]]) for row in rows] for name in names},
+            'next_cursor': next_cursor,
+        }
+
+    def get_company_id(self, name: str):
+        """id компании по названию (с нормализацией)"""
+        session = self.db.get_session()
+        try:
+            normalized = self.normalize_company_name(name).lower()
+            # lower() в SQLite не работает с кириллицей - сравниваем в Python
+            for company_id, company_name in session.query(Company.id, Company.name):
+                if company_name.lower() == normalized:
+                    return company_id
+            return None
+        finally:
+            self.db.close_session()
+
     def _parse_date_string(self, date_str: str):
         if not date_str: return None
         date_str = str(date_str).strip()
@@ -414,87 +877,109 @@ class DatabaseQueries:
         if 'sheet7' in parsed_data: self.save_sheet7_data(file_id, company_id, report_date, parsed_data['sheet7'])
         return file_id
 
-    def get_aggregated_data(self, report_date: datetime = None, company_id: int = None) -> Dict[str, Any]:
+    def get_aggregated_data(self, report_date: dt_date = None, company_id: int = None, sheets=None) -> Dict[str, Any]:
+        """Данные отчета по компаниям на дату.
+
+        Для каждого листа берутся строки последней даты компании, не позже
+        report_date (as-of); без даты - самые свежие. Один запрос на лист
+        по индексу (company_id, report_date) вместо запросов по каждой компании.
+        sheets - только эти ключи AGGREGATED_SHEETS (перерисовка части листов).
+        """
+        if isinstance(report_date, datetime):
+            report_date = report_date.date()
         session = self.db.get_session()
         try:
-            result = {}
-            companies = session.query(Company).filter(Company.id == company_id).all() if company_id else session.query(Company).filter(Company.is_active == True).all()
-            for company in companies:
-                company_data = {'name': company.name, 'sheet1': [], 'sheet2': {}, 'sheet3_data': [], 'sheet4_data': [], 'sheet5_data': [], 'sheet6_data': [], 'sheet7_data': []}
-                has_data = False
-                
-                # Sheet 1
-                s1 = session.query(Sheet1Structure).filter(Sheet1Structure.company_id == company.id).order_by(Sheet1Structure.report_date.desc()).all()
-                if s1:
-                    last_date = s1[0].report_date
-                    for item in [x for x in s1 if x.report_date == last_date]:
-                        company_data['sheet1'].append({'affiliation': item.affiliation, 'company_name': item.company_name, 'oil_depots_count': item.oil_depots_count, 'azs_count': item.azs_count, 'working_azs_count': item.working_azs_count})
-                        has_data = True
-
-                # Sheet 2
-                s2 = session.query(Sheet2Demand).filter(Sheet2Demand.company_id == company.id).order_by(Sheet2Demand.report_date.desc()).first()
-                if s2:
-                    company_data['sheet2'] = {'year': s2.report_date.year, 'gasoline_total': s2.gasoline_total, 'gasoline_ai92': s2.gasoline_ai92, 'gasoline_ai95': s2.gasoline_ai95, 'diesel_total': s2.diesel_total, 'monthly_gasoline_total': s2.monthly_gasoline_total, 'monthly_diesel_total': s2.monthly_diesel_total}
-                    has_data = True
-
-                # Sheet 3
-                s3 = session.query(Sheet3Balance).filter(Sheet3Balance.company_id == company.id).order_by(Sheet3Balance.report_date.desc()).all()
-                if s3:
-                    last_date = s3[0].report_date
-                    for item in [x for x in s3 if x.report_date == last_date]:
-                        company_data['sheet3_data'].append({
-                            'location_name': item.location_name, 'stock_ai92': item.stock_ai92, 'stock_ai95': item.stock_ai95, 'stock_ai98_ai100': item.stock_ai98_100,
-                            'stock_diesel_winter': item.stock_diesel_winter, 'stock_diesel_arctic': item.stock_diesel_arctic, 'stock_diesel_summer': item.stock_diesel_summer,
-                            'transit_ai92': item.transit_ai92, 'transit_ai95': item.transit_ai95, 'transit_ai98_ai100': item.transit_ai98_100,
-                            'transit_diesel_winter': item.transit_diesel_winter, 'transit_diesel_arctic': item.transit_diesel_arctic, 'transit_diesel_summer': item.transit_diesel_summer,
-                            'capacity_ai92': item.capacity_ai92, 'capacity_ai95': item.capacity_ai95, 'capacity_ai98_ai100': item.capacity_ai98_100,
-                            'capacity_diesel_winter': item.capacity_diesel_winter, 'capacity_diesel_arctic': item.capacity_diesel_arctic, 'capacity_diesel_summer': item.capacity_diesel_summer,
-                        })
-                        has_data = True
-
-                # Sheet 4
-                s4 = session.query(Sheet4Supply).filter(Sheet4Supply.company_id == company.id).order_by(Sheet4Supply.report_date.desc()).all()
-                if s4:
-                    last_date = s4[0].report_date
-                    for item in [x for x in s4 if x.report_date == last_date]:
-                        company_data['sheet4_data'].append({'oil_depot_name': item.oil_depot_name, 'supply_date': item.supply_date, 'supply_ai92': item.supply_ai92, 'supply_ai95': item.supply_ai95, 'supply_ai98_100': item.supply_ai98_100, 'supply_diesel_winter': item.supply_diesel_winter, 'supply_diesel_arctic': item.supply_diesel_arctic, 'supply_diesel_summer': item.supply_diesel_summer})
-                        has_data = True
-
-                # Sheet 5
-                s5 = session.query(Sheet5Sales).filter(Sheet5Sales.company_id == company.id).order_by(Sheet5Sales.report_date.desc()).all()
-                if s5:
-                    last_date = s5[0].report_date
-                    for item in [x for x in s5 if x.report_date == last_date]:
-                        company_data['sheet5_data'].append({
-                            'location_name': item.location_name, 'daily_ai92': item.daily_ai92, 'daily_ai95': item.daily_ai95, 'daily_ai98_100': item.daily_ai98_100, 'daily_winter': item.daily_diesel_winter, 'daily_arctic': item.daily_diesel_arctic, 'daily_summer': item.daily_diesel_summer,
-                            'monthly_ai92': item.monthly_ai92, 'monthly_ai95': item.monthly_ai95, 'monthly_ai98_100': item.monthly_ai98_100, 'monthly_diesel_winter': item.monthly_diesel_winter, 'monthly_diesel_arctic': item.monthly_diesel_arctic, 'monthly_diesel_summer': item.monthly_diesel_summer
-                        })
-                        has_data = True
-
-                # Sheet 6
-                s6 = session.query(Sheet6Aviation).filter(Sheet6Aviation.company_id == company.id).order_by(Sheet6Aviation.report_date.desc()).all()
-                if s6:
-                    last_date = s6[0].report_date
-                    for item in [x for x in s6 if x.report_date == last_date]:
-                        company_data['sheet6_data'].append({'airport_name': item.airport_name, 'tzk_name': item.tzk_name, 'contracts_info': item.contracts_info, 'supply_week': item.supply_week, 'supply_month_start': item.supply_month_start, 'monthly_demand': item.monthly_demand, 'consumption_week': item.consumption_week, 'consumption_month_start': item.consumption_month_start, 'end_of_day_balance': item.end_of_day_balance})
-                        has_data = True
-
-                # Sheet 7
-                s7 = session.query(Sheet7Comments).filter(Sheet7Comments.company_id == company.id).order_by(Sheet7Comments.report_date.desc()).all()
-                if s7:
-                    last_date = s7[0].report_date
-                    for item in [x for x in s7 if x.report_date == last_date]:
-                        company_data['sheet7_data'].append({'fuel_type': item.fuel_type, 'situation': item.situation, 'comments': item.comments})
-                        has_data = True
-
-                if has_data: result[company.name] = company_data
-            return result
+            sheets_by_company = {}
+            for key, model, convert in AGGREGATED_SHEETS:
+                if sheets is not None and key not in sheets:
+                    continue
+                for item in self._latest_rows(session, model, report_date, company_id):
+                    records = sheets_by_company.setdefault(item.company_id, {}).setdefault(key, [])
+                    records.append(convert(item))
+            return self._assemble_aggregated(self._report_companies(session, company_id), sheets_by_company)
         except Exception as e:
             print(f"Error: {e}")
             return {}
         finally:
             self.db.close_session()
 
+    def get_aggregated_data_range(self, date_from: dt_date, date_to: dt_date,
+                                  company_id: int = None) -> Dict[dt_date, Dict[str, Any]]:
+        """Данные отчетов за каждый день диапазона: {дата: get_aggregated_data(дата)}.
+
+        Один запрос на лист за весь диапазон (включая последнюю дату до его
+        начала), дальше строки раскладываются по дням в памяти.
+        """
+        session = self.db.get_session()
+        try:
+            # {лист: {company_id: (отсортированные даты, {дата: записи})}}
+            per_sheet = {}
+            for key, model, convert in AGGREGATED_SHEETS:
+                by_company = {}
+                for item in self._range_rows(session, model, date_from, date_to, company_id):
+                    by_company.setdefault(item.company_id, {}).setdefault(item.report_date, []).append(convert(item))
+                per_sheet[key] = {cid: (sorted(dates), dates) for cid, dates in by_company.items()}
+
+            companies = self._report_companies(session, company_id)
+            result = {}
+            day = date_from
+            while day <= date_to:
+                sheets_by_company = {}
+                for key, by_company in per_sheet.items():
+                    for cid, (dates, records) in by_company.items():
+                        # Последняя дата компании не позже дня отчета
+                        idx = bisect.bisect_right(dates, day)
+                        if idx:
+                            sheets_by_company.setdefault(cid, {})[key] = records[dates[idx - 1]]
+                result[day] = self._assemble_aggregated(companies, sheets_by_company)
+                day += timedelta(days=1)
+            return result
+        finally:
+            self.db.close_session()
+
+    def _report_companies(self, session, company_id: int = None) -> List[Company]:
+        query = session.query(Company)
+        return query.filter(Company.id == company_id).all() if company_id else query.filter(Company.is_active == True).all()
+
+    def _assemble_aggregated(self, companies: List[Company], sheets_by_company: dict) -> Dict[str, Any]:
+        aggregated = {}
+        for company in companies:
+            sheets = sheets_by_company.get(company.id)
+            if not sheets:
+                continue
+            company_data = {'name': company.name, 'sheet1': [], 'sheet2': {}, 'sheet3_data': [], 'sheet4_data': [], 'sheet5_data': [], 'sheet6_data': [], 'sheet7_data': []}
+            for key, records in sheets.items():
+                # Лист 2 - одна запись на компанию
+                company_data[key] = records[0] if key == 'sheet2' else list(records)
+            aggregated[company.name] = company_data
+        return add_report_totals(aggregated)
+
+    def _latest_rows(self, session, model, as_of: dt_date = None, company_id: int = None):
+        """Строки листа за последнюю дату каждой компании (не позже as_of)"""
+        latest = select(model.company_id, func.max(model.report_date).label('report_date'))
+        if as_of is not None:
+            latest = latest.where(model.report_date <= as_of)
+        if company_id is not None:
+            latest = latest.where(model.company_id == company_id)
+        latest = latest.group_by(model.company_id).subquery()
+        return session.query(model).join(
+            latest, and_(model.company_id == latest.c.company_id, model.report_date == latest.c.report_date)
+        ).order_by(model.company_id, model.id).all()
+
+    def _range_rows(self, session, model, date_from: dt_date, date_to: dt_date, company_id: int = None):
+        """Строки листа за диапазон и последняя дата каждой компании перед его началом"""
+        anchor = select(model.company_id, func.max(model.report_date).label('report_date')).where(model.report_date <= date_from)
+        if company_id is not None:
+            anchor = anchor.where(model.company_id == company_id)
+        anchor = anchor.group_by(model.company_id).subquery()
+        query = session.query(model).outerjoin(anchor, model.company_id == anchor.c.company_id).filter(
+            model.report_date <= date_to,
+            model.report_date >= func.coalesce(anchor.c.report_date, date_from)
+        )
+        if company_id is not None:
+            query = query.filter(model.company_id == company_id)
+        return query.order_by(model.company_id, model.id).all()
+
     def update_file_status(self, file_id: int, status: str, error_message: str = None):
         session = self.db.get_session()
         try:
@@ -502,10 +987,56 @@ class DatabaseQueries:
             if f:
                 f.status = status
                 if error_message: f.error_message = error_message
+                data_versions.bump(session, UploadedFile.__tablename__)
                 session.commit()
                 return True
             return False
         finally:
             self.db.close_session()
 
+def _sheet1_record(item) -> dict:
+    return {'affiliation': item.affiliation, 'company_name': item.company_name, 'oil_depots_count': item.oil_depots_count, 'azs_count': item.azs_count, 'working_azs_count': item.working_azs_count}
+
+def _sheet2_record(item) -> dict:
+    return {'year': item.report_date.year, 'gasoline_total': item.gasoline_total, 'gasoline_ai92': item.gasoline_ai92, 'gasoline_ai95': item.gasoline_ai95, 'diesel_total': item.diesel_total, 'monthly_gasoline_total': item.monthly_gasoline_total, 'monthly_diesel_total': item.monthly_diesel_total}
+
+def _sheet3_record(item) -> dict:
+    return {
+        'location_name': item.location_name, 'stock_ai92': item.stock_ai92, 'stock_ai95': item.stock_ai95, 'stock_ai98_ai100': item.stock_ai98_100,
+        'stock_diesel_winter': item.stock_diesel_winter, 'stock_diesel_arctic': item.stock_diesel_arctic, 'stock_diesel_summer': item.stock_diesel_summer,
+        'transit_ai92': item.transit_ai92, 'transit_ai95': item.transit_ai95, 'transit_ai98_ai100': item.transit_ai98_100,
+        'transit_diesel_winter': item.transit_diesel_winter, 'transit_diesel_arctic': item.transit_diesel_arctic, 'transit_diesel_summer': item.transit_diesel_summer,
+        'capacity_ai92': item.capacity_ai92, 'capacity_ai95': item.capacity_ai95, 'capacity_ai98_ai100': item.capacity_ai98_100,
+        'capacity_diesel_winter': item.capacity_diesel_winter, 'capacity_diesel_arctic': item.capacity_diesel_arctic, 'capacity_diesel_summer': item.capacity_diesel_summer,
+    }
+
+def _sheet4_record(item) -> dict:
+    return {'oil_depot_name': item.oil_depot_name, 'supply_date': item.supply_date, 'supply_ai92': item.supply_ai92, 'supply_ai95': item.supply_ai95, 'supply_ai98_100': item.supply_ai98_100, 'supply_diesel_winter': item.supply_diesel_winter, 'supply_diesel_arctic': item.supply_diesel_arctic, 'supply_diesel_summer': item.supply_diesel_summer}
+
+def _sheet5_record(item) -> dict:
+    return {
+        'location_name': item.location_name, 'daily_ai92': item.daily_ai92, 'daily_ai95': item.daily_ai95, 'daily_ai98_100': item.daily_ai98_100, 'daily_winter': item.daily_diesel_winter, 'daily_arctic': item.daily_diesel_arctic, 'daily_summer': item.daily_diesel_summer,
+        'monthly_ai92': item.monthly_ai92, 'monthly_ai95': item.monthly_ai95, 'monthly_ai98_100': item.monthly_ai98_100, 'monthly_diesel_winter': item.monthly_diesel_winter, 'monthly_diesel_arctic': item.monthly_diesel_arctic, 'monthly_diesel_summer': item.monthly_diesel_summer
+    }
+
+def _sheet6_record(item) -> dict:
+    return {'airport_name': item.airport_name, 'tzk_name': item.tzk_name, 'contracts_info': item.contracts_info, 'supply_week': item.supply_week, 'supply_month_start': item.supply_month_start, 'monthly_demand': item.monthly_demand, 'consumption_week': item.consumption_week, 'consumption_month_start': item.consumption_month_start, 'end_of_day_balance': item.end_of_day_balance}
+
+def _sheet7_record(item) -> dict:
+    return {'fuel_type': item.fuel_type, 'situation': item.situation, 'comments': item.comments}
+
+# Листы сводного отчета: ключ в данных компании, модель и преобразование строки
+AGGREGATED_SHEETS = [
+    ('sheet1', Sheet1Structure, _sheet1_record),
+    ('sheet2', Sheet2Demand, _sheet2_record),
+    ('sheet3_data', Sheet3Balance, _sheet3_record),
+    ('sheet4_data', Sheet4Supply, _sheet4_record),
+    ('sheet5_data', Sheet5Sales, _sheet5_record),
+    ('sheet6_data', Sheet6Aviation, _sheet6_record),
+    ('sheet7_data', Sheet7Comments, _sheet7_record),
+]
+
+# Таблицы, от которых зависят данные листа: своя таблица и список компаний
+AGGREGATED_TABLES = {key: (model.__tablename__, Company.__tablename__) for key, model, _ in AGGREGATED_SHEETS}
+
 db = DatabaseQueries()
\ No newline at end of file
@@ -0,0 +1,88 @@
+# database/report_totals.py
+from typing import Any, Dict, List, Tuple
+
+# Листы с итогами: ключ строк компании -> (ключ итогов, суммируемые колонки)
+TOTAL_SHEETS = {
+    'sheet3_data': ('sheet3_totals', [
+        'stock_ai92', 'stock_ai95', 'stock_ai98_ai100', 'stock_diesel_winter', 'stock_diesel_arctic', 'stock_diesel_summer',
+        'transit_ai92', 'transit_ai95', 'transit_ai98_ai100', 'transit_diesel_winter', 'transit_diesel_arctic', 'transit_diesel_summer',
+        'capacity_ai92', 'capacity_ai95', 'capacity_ai98_ai100', 'capacity_diesel_winter', 'capacity_diesel_arctic', 'capacity_diesel_summer',
+    ]),
+    'sheet4_data': ('sheet4_totals', [
+        'supply_ai92', 'supply_ai95', 'supply_ai98_100', 'supply_diesel_winter', 'supply_diesel_arctic', 'supply_diesel_summer',
+    ]),
+    'sheet5_data': ('sheet5_totals', [
+        'daily_ai92', 'daily_ai95', 'daily_ai98_100', 'daily_winter', 'daily_arctic', 'daily_summer',
+        'monthly_ai92', 'monthly_ai95', 'monthly_ai98_100', 'monthly_diesel_winter', 'monthly_diesel_arctic', 'monthly_diesel_summer',
+    ]),
+}
+
+def company_affiliation(company_name: str, company_data: dict) -> str:
+    """Принадлежность компании (ВИНК / независимые) из листа 1"""
+    records = company_data.get('sheet1') or []
+    for record in records:
+        if record.get('company_name') == company_name and record.get('affiliation'):
+            return record['affiliation'].strip()
+    for record in records:
+        if record.get('affiliation'):
+            return record['affiliation'].strip()
+    return ''
+
+def add_report_totals(aggregated: Dict[str, Any]) -> Dict[str, Any]:
+    """Итоги компаний по топливным колонкам (sheet3_totals, sheet4_totals, sheet5_totals).
+
+    Строки листа всех компаний собираются в один DataFrame и суммируются
+    одним groupby, без построчных сумм в Python и формул SUM в Excel.
+    Компании также получают affiliation для групповых итогов.
+    """
+    for company_name, company_data in aggregated.items():
+        company_data['affiliation'] = company_affiliation(company_name, company_data)
+        for totals_key, _ in TOTAL_SHEETS.values():
+            company_data[totals_key] = {}
+    if not aggregated:
+        return aggregated
+
+    import pandas as pd
+    for source, (totals_key, fields) in TOTAL_SHEETS.items():
+        companies, records = [], []
+        for company_name, company_data in aggregated.items():
+            rows = company_data.get(source) or []
+            companies.extend([company_name] * len(rows))
+            records.extend(rows)
+        if not records:
+            continue
+        frame = pd.DataFrame.from_records(records, columns=fields).apply(pd.to_numeric, errors='coerce')
+        frame['company'] = companies
+        for company_name, totals in frame.groupby('company', sort=False)[fields].sum().iterrows():
+            aggregated[company_name][totals_key] = _plain(totals)
+    return aggregated
+
+def summary_totals(aggregated: Dict[str, Any], totals_key: str) -> Tuple[Dict[str, dict], dict]:
+    """Итоги групп принадлежности и общий итог из итогов компаний: ({группа: итоги}, итоги)"""
+    source = next(src for src, (key, _) in TOTAL_SHEETS.items() if key == totals_key)
+    fields = TOTAL_SHEETS[source][1]
+    totals = [(data.get('affiliation', ''), data[totals_key]) for data in aggregated.values() if data.get(totals_key)]
+    if not totals:
+        return {}, {}
+
+    import pandas as pd
+    frame = pd.DataFrame.from_records([t for _, t in totals], columns=fields)
+    frame['affiliation'] = [a for a, _ in totals]
+    groups = {affiliation: _plain(row) for affiliation, row in frame.groupby('affiliation', sort=False)[fields].sum().iterrows()}
+    return groups, _plain(frame[fields].sum())
+
+def _plain(series) -> Dict[str, float]:
+    # numpy-типы -> float (json, pickle между процессами, запись в ячейки);
+    # округление убирает хвосты сложения вроде 0.3398450000000001
+    return {field: round(float(value), 10) for field, value in series.items()}
+
+def group_order(aggregated: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+    """Компании по группам принадлежности в порядке первого появления; без группы - в конце"""
+    groups = {}
+    for company_name, company_data in aggregated.items():
+        groups.setdefault(company_data.get('affiliation', ''), []).append(company_name)
+    ungrouped = groups.pop('', [])
+    ordered = list(groups.items())
+    if ungrouped:
+        ordered.append(('', ungrouped))
+    return ordered
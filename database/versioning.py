@@ -0,0 +1,92 @@
+# database/versioning.py
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import event
+from config import Config
+from .connection import db_connection
+from .models import DataVersion
+
+GLOBAL_SCOPE = 'global'
+
+class DataVersionTracker:
+    """Версии данных: 'global' и по таблицам.
+
+    Загрузка увеличивает счетчики в той же транзакции, что и данные.
+    Процесс держит копию счетчиков и перечитывает их из БД не чаще раза
+    в Config.DATA_VERSION_TTL секунд, так что проверка версии почти
+    всегда обходится без запроса к БД.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = Config.DATA_VERSION_TTL if ttl is None else ttl
+        self._versions = {}
+        self._updated = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def bump(self, session, *scopes: str):
+        """Увеличение версий в текущей транзакции сессии"""
+        for scope in {GLOBAL_SCOPE, *scopes}:
+            updated = session.query(DataVersion).filter(DataVersion.scope == scope).update(
+                {DataVersion.version: DataVersion.version + 1}, synchronize_session=False
+            )
+            if not updated:
+                session.add(DataVersion(scope=scope, version=1))
+        session.flush()
+        # Новые значения станут видны после коммита
+        event.listen(session, 'after_commit', lambda s: self.invalidate(), once=True)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def current(self, scope: str = GLOBAL_SCOPE) -> int:
+        return self.versions().get(scope, 0)
+
+    def updated_at(self, scope: str = GLOBAL_SCOPE) -> Optional[datetime]:
+        """Время последнего увеличения версии (Last-Modified для HTTP-кэша)"""
+        self.versions()
+        return self._updated.get(scope)
+
+    def versions(self) -> Dict[str, int]:
+        now = time.monotonic()
+        if now - self._loaded_at < self.ttl:
+            return self._versions
+        with self._lock:
+            if now - self._loaded_at >= self.ttl:
+                session = db_connection.session_factory()
+                try:
+                    rows = session.query(DataVersion.scope, DataVersion.version, DataVersion.updated_at).all()
+                finally:
+                    session.close()
+                self._versions = {scope: version for scope, version, _ in rows}
+                self._updated = {scope: updated_at for scope, _, updated_at in rows}
+                self._loaded_at = time.monotonic()
+            return self._versions
+
+class VersionedCache:
+    """Кэш в памяти процесса, сбрасываемый при смене версии данных"""
+
+    def __init__(self, tracker: DataVersionTracker):
+        self.tracker = tracker
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, compute: Callable[[], Any], scope: str = GLOBAL_SCOPE) -> Any:
+        version = self.tracker.current(scope)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Глобальные версии данных процесса
+data_versions = DataVersionTracker()
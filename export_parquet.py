@@ -0,0 +1,23 @@
+# export_parquet.py - выгрузка таблиц для аналитики: python export_parquet.py [--dir DIR]
+import argparse
+import os
+import sys
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+from app.services.analytics import export_parquet
+from database.bootstrap import ensure_schema
+
+def main():
+    parser = argparse.ArgumentParser(description='Выгрузка таблиц в Parquet для ANALYTICS_SOURCE=parquet')
+    parser.add_argument('--dir', default=Config.ANALYTICS_PARQUET_DIR, help='Каталог выгрузки')
+    args = parser.parse_args()
+
+    ensure_schema()
+    counts = export_parquet(args.dir)
+    print(f"📦 Parquet-выгрузка в {args.dir}: {sum(counts.values())} строк, {len(counts)} таблиц")
+
+if __name__ == "__main__":
+    main()
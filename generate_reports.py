@@ -0,0 +1,36 @@
+# generate_reports.py
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+# Добавляем текущую директорию в путь поиска модулей
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.report_batch import ReportBatch, BATCH_OUTPUTS
+from app.services.report_cache import SUMMARY_REPORT_NAME
+from database.bootstrap import ensure_schema
+from database.queries import DatabaseQueries
+
+def parse_date(value: str):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетная генерация сводных отчетов за диапазон дат')
+    parser.add_argument('date_from', type=parse_date, help='Начало диапазона, ГГГГ-ММ-ДД')
+    parser.add_argument('date_to', type=parse_date, nargs='?', help='Конец диапазона (по умолчанию = начало)')
+    parser.add_argument('--output', choices=BATCH_OUTPUTS, default='zip',
+                        help='zip - один архив; entries - отдельные файлы в кэше отчетов')
+    parser.add_argument('--config', default=SUMMARY_REPORT_NAME, help='Имя конфигурации отчета (ReportConfig)')
+    parser.add_argument('--processes', type=int, default=None, help='Число процессов рендера')
+    args = parser.parse_args()
+
+    ensure_schema()
+    batch = ReportBatch(DatabaseQueries(), config_name=args.config, processes=args.processes)
+    result = batch.run(args.date_from, args.date_to or args.date_from, output=args.output,
+                       generated_by='cli', progress=lambda name, done, total: print(f"   {name}: {done}/{total}"))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# gunicorn.conf.py - запуск: gunicorn -c gunicorn.conf.py wsgi:app
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+# Потоки внутри воркера: загрузки и отчеты в основном ждут БД и диск
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+accesslog = '-'
+
+# Приложение (схема БД, скомпилированный шаблон) загружается один раз в мастере,
+# воркеры получают его при fork без повторной инициализации
+preload_app = True
+
+# Задания фоновой генерации отчетов хранятся в памяти воркера: опрос статуса
+# должен приходить в тот же процесс (при нескольких воркерах - привязка сессий на прокси)
+
+def post_fork(server, worker):
+    # Соединения мастера не должны использоваться воркерами
+    from database.connection import db_connection
+    db_connection.dispose_after_fork()
+
+def post_worker_init(worker):
+    from app import warm_up
+    warm_up()
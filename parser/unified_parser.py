@@ -13,6 +13,8 @@ class UnifiedParser:
         self.file_path = file_path
         self.wb = None
         self.merged_cell_ranges = {}
+        # Хук хода парсинга: on_sheet(sheet_key, records) после каждого листа
+        self.on_sheet = None
     
     # В методе parse_all() unified_parser.py
     def parse_all(self) -> Dict[str, Any]:
@@ -29,16 +31,20 @@ class UnifiedParser:
             # Кэшируем объединенные ячейки
             self._cache_merged_cells()
             
-            result = {
-                'metadata': self._parse_metadata(),
-                # 'sheet1': self._parse_sheet1(),  # Структура - список
-                # 'sheet2': self._parse_sheet2(),  # Потребность - словарь
-                'sheet3': self._parse_sheet3(),  # Остатки - список
-                'sheet4': self._parse_sheet4(),  # Поставки - список
-                'sheet5': self._parse_sheet5(),  # Реализация - список
-                'sheet6': self._parse_sheet6(),  # Авиатопливо - список
-                # 'sheet7': self._parse_sheet7(),  # Справка - список
-            }
+            result = {'metadata': self._parse_metadata()}
+            sheet_parsers = [
+                # ('sheet1', self._parse_sheet1),  # Структура - список
+                # ('sheet2', self._parse_sheet2),  # Потребность - словарь
+                ('sheet3', self._parse_sheet3),  # Остатки - список
+                ('sheet4', self._parse_sheet4),  # Поставки - список
+                ('sheet5', self._parse_sheet5),  # Реализация - список
+                ('sheet6', self._parse_sheet6),  # Авиатопливо - список
+                # ('sheet7', self._parse_sheet7),  # Справка - список
+            ]
+            for sheet_key, parse_sheet in sheet_parsers:
+                result[sheet_key] = parse_sheet()
+                if self.on_sheet:
+                    self.on_sheet(sheet_key, len(result[sheet_key]))
             
             print("✅ Парсинг завершен успешно!")
             return result
@@ -0,0 +1,276 @@
+# reports/report_config.py
+import json
+import threading
+from typing import Any, Callable, Dict, List
+from database.report_totals import TOTAL_SHEETS, group_order, summary_totals
+
+# Раскладка сводного отчета по умолчанию (хранится в ReportConfig.config).
+# Лист: source - ключ данных компании в get_aggregated_data, start_row - первая
+# строка данных, columns - {колонка: поле}. Поле - имя ключа записи (по умолчанию 0)
+# или словарь: field, default, scale (множитель), as_text (str(значение)),
+# company (имя компании, если поля нет). skip - пропуск строк-заголовков,
+# blocks - несколько областей листа из одной записи (годовая/месячная потребность).
+# totals - строки итогов значениями: после строк компании, после группы
+# принадлежности и в конце листа (source - ключ итогов, label_field - поле подписи).
+DEFAULT_REPORT_CONFIG = {
+    'sheets': {
+        '1-Структура': {
+            'source': 'sheet1',
+            'start_row': 13,
+            'skip': {'field': 'company_name', 'contains': 'наименование компаний'},
+            'columns': {
+                '1': {'field': 'affiliation', 'default': ''},
+                '2': {'field': 'company_name', 'company': True},
+                '3': 'oil_depots_count',
+                '4': 'azs_count',
+                '5': 'working_azs_count',
+            },
+        },
+        '2-Потребность': {
+            'source': 'sheet2',
+            'blocks': [
+                {
+                    'start_row': 7,
+                    'columns': {
+                        '1': {'company': True},
+                        '4': 'gasoline_ai92',
+                        '5': 'gasoline_ai95',
+                        '8': 'diesel_total',
+                    },
+                },
+                {
+                    'start_row': 13,
+                    'columns': {
+                        '1': {'company': True},
+                        '4': {'field': 'monthly_gasoline_total', 'scale': 0.5},
+                        '5': {'field': 'monthly_gasoline_total', 'scale': 0.5},
+                        '8': 'monthly_diesel_total',
+                    },
+                },
+            ],
+        },
+        '3-Остатки': {
+            'source': 'sheet3_data',
+            'start_row': 9,
+            'totals': {'source': 'sheet3_totals', 'label_field': 'location_name'},
+            'columns': {
+                '2': {'company': True},
+                '3': {'field': 'location_name', 'default': ''},
+                # Остатки
+                '5': 'stock_ai92', '6': 'stock_ai95', '7': 'stock_ai98_ai100',
+                '8': 'stock_diesel_winter', '9': 'stock_diesel_arctic', '10': 'stock_diesel_summer',
+                # В пути
+                '13': 'transit_ai92', '14': 'transit_ai95', '15': 'transit_ai98_ai100',
+                '16': 'transit_diesel_winter', '17': 'transit_diesel_arctic', '18': 'transit_diesel_summer',
+                # Емкость
+                '21': 'capacity_ai92', '22': 'capacity_ai95', '23': 'capacity_ai98_ai100',
+                '24': 'capacity_diesel_winter', '25': 'capacity_diesel_arctic', '26': 'capacity_diesel_summer',
+            },
+        },
+        '4-Поставка': {
+            'source': 'sheet4_data',
+            'start_row': 9,
+            'totals': {'source': 'sheet4_totals', 'label_field': 'oil_depot_name'},
+            'columns': {
+                '2': {'company': True},
+                '3': {'field': 'oil_depot_name', 'default': ''},
+                '4': {'field': 'supply_date', 'default': '', 'as_text': True},
+                '6': 'supply_ai92', '7': 'supply_ai95', '8': 'supply_ai98_100',
+                '9': 'supply_diesel_winter', '10': 'supply_diesel_arctic', '11': 'supply_diesel_summer',
+            },
+        },
+        '5-Реализация': {
+            'source': 'sheet5_data',
+            'start_row': 9,
+            'totals': {'source': 'sheet5_totals', 'label_field': 'location_name'},
+            'columns': {
+                '2': {'company': True},
+                '3': {'field': 'location_name', 'default': ''},
+                # За сутки
+                '5': 'daily_ai92', '6': 'daily_ai95', '7': 'daily_ai98_100',
+                '8': 'daily_winter', '9': 'daily_arctic', '10': 'daily_summer',
+                # С начала месяца
+                '13': 'monthly_ai92', '14': 'monthly_ai95', '15': 'monthly_ai98_100',
+                '16': 'monthly_diesel_winter', '17': 'monthly_diesel_arctic', '18': 'monthly_diesel_summer',
+            },
+        },
+        '6-Авиатопливо': {
+            'source': 'sheet6_data',
+            'start_row': 8,
+            'columns': {
+                '1': {'field': 'airport_name', 'default': ''},
+                '2': {'field': 'tzk_name', 'default': ''},
+                '3': {'field': 'contracts_info', 'default': ''},
+                '4': 'supply_week', '5': 'supply_month_start', '6': 'monthly_demand',
+                '7': 'consumption_week', '8': 'consumption_month_start', '9': 'end_of_day_balance',
+            },
+        },
+        '7-Комментарии': {
+            'source': 'sheet7_data',
+            'start_row': 6,
+            'columns': {
+                '1': {'field': 'fuel_type', 'default': ''},
+                '2': {'field': 'situation', 'default': ''},
+                '3': {'field': 'comments', 'default': ''},
+            },
+        },
+    },
+}
+
+# Подписи строк итогов
+COMPANY_TOTAL_LABEL = 'Итого'
+GROUP_TOTAL_LABEL = 'Итого по группе'
+GRAND_TOTAL_LABEL = 'ВСЕГО'
+
+class ReportConfigError(ValueError):
+    """Некорректная раскладка отчета в ReportConfig.config"""
+
+def _compile_column(col: str, spec) -> Callable[[dict, str], Any]:
+    if isinstance(spec, str):
+        spec = {'field': spec}
+    if not isinstance(spec, dict):
+        raise ReportConfigError(f'Колонка {col}: ожидается имя поля или словарь')
+    field = spec.get('field')
+    default = spec.get('default', 0)
+    scale = spec.get('scale')
+    as_text = spec.get('as_text', False)
+
+    if field is None:
+        if not spec.get('company'):
+            raise ReportConfigError(f'Колонка {col}: не указано поле')
+        return lambda record, company: company
+    if spec.get('company'):
+        return lambda record, company: _blank(record.get(field, company))
+    if scale is not None:
+        return lambda record, company: record.get(field, 0) * scale if record.get(field) else 0
+    if as_text:
+        return lambda record, company: str(record.get(field, default))
+    return lambda record, company: _blank(record.get(field, default))
+
+def _blank(value):
+    # Пустое значение в ячейке - пустая строка
+    return '' if value is None else value
+
+class _BlockWriter:
+    """Область листа: для каждой записи - одна строка {колонка: значение}"""
+
+    def __init__(self, start_row: int, columns: dict):
+        if not columns:
+            raise ReportConfigError('Пустой список колонок')
+        self.start_row = int(start_row)
+        self.columns = [(int(col), _compile_column(col, spec)) for col, spec in sorted(columns.items(), key=lambda c: int(c[0]))]
+
+    def row(self, record: dict, company: str) -> Dict[int, Any]:
+        return {col: getter(record, company) for col, getter in self.columns}
+
+class SheetWriter:
+    """Скомпилированная раскладка одного листа"""
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.source = spec.get('source')
+        if not self.source:
+            raise ReportConfigError(f'Лист {name}: не указан source')
+        blocks = spec.get('blocks') or [{'start_row': spec.get('start_row'), 'columns': spec.get('columns')}]
+        try:
+            self.blocks = [_BlockWriter(b['start_row'], b['columns']) for b in blocks]
+        except (KeyError, TypeError) as e:
+            raise ReportConfigError(f'Лист {name}: некорректная область ({e})')
+        skip = spec.get('skip')
+        self.skip_field = skip['field'] if skip else None
+        self.skip_text = skip['contains'].lower() if skip else None
+        totals = spec.get('totals')
+        self.totals_source = totals['source'] if totals else None
+        self.totals_label = totals.get('label_field') if totals else None
+        if self.totals_source and self.totals_source not in {key for key, _ in TOTAL_SHEETS.values()}:
+            raise ReportConfigError(f'Лист {name}: неизвестные итоги {self.totals_source}')
+
+    @property
+    def sources(self) -> set:
+        """Ключи данных компании, от которых зависит лист (итоги группируются по листу 1)"""
+        return {self.source, 'sheet1'} if self.totals_source else {self.source}
+
+    def build_rows(self, aggregated_data: dict) -> Dict[int, Dict[int, Any]]:
+        rows = {}
+        offset = 0
+
+        def put(record: dict, company: str):
+            nonlocal offset
+            for block in self.blocks:
+                rows.setdefault(block.start_row + offset, {}).update(block.row(record, company))
+            offset += 1
+
+        if not self.totals_source:
+            for company_name, company_data in aggregated_data.items():
+                for record in self._records(company_data):
+                    put(record, company_name)
+            return rows
+
+        # Компании по группам принадлежности; итоги уже посчитаны при агрегации
+        groups, grand = summary_totals(aggregated_data, self.totals_source)
+        for affiliation, companies in group_order(aggregated_data):
+            for company_name in companies:
+                company_data = aggregated_data[company_name]
+                records = self._records(company_data)
+                for record in records:
+                    put(record, company_name)
+                if records and company_data.get(self.totals_source):
+                    put(self._total_record(company_data[self.totals_source], COMPANY_TOTAL_LABEL), company_name)
+            if affiliation and affiliation in groups:
+                put(self._total_record(groups[affiliation], GROUP_TOTAL_LABEL), affiliation)
+        if grand:
+            put(self._total_record(grand, ''), GRAND_TOTAL_LABEL)
+        return rows
+
+    def _records(self, company_data: dict) -> list:
+        records = company_data.get(self.source)
+        if not records:
+            return []
+        if isinstance(records, dict):
+            records = [records]
+        if self.skip_field:
+            records = [r for r in records if self.skip_text not in str(r.get(self.skip_field, '')).lower()]
+        return records
+
+    def _total_record(self, totals: dict, label: str) -> dict:
+        record = dict(totals)
+        if self.totals_label:
+            record[self.totals_label] = label
+        return record
+
+class CompiledReportConfig:
+    """Раскладка отчета, скомпилированная в построители строк по листам"""
+
+    def __init__(self, config: dict):
+        sheets = (config or {}).get('sheets')
+        if not isinstance(sheets, dict) or not sheets:
+            raise ReportConfigError('В конфигурации отчета нет раскладки листов')
+        self.key = _config_key(config)
+        self.sheets: List[SheetWriter] = [SheetWriter(name, spec) for name, spec in sheets.items()]
+        self.by_name = {sheet.name: sheet for sheet in self.sheets}
+
+    def build_rows(self, aggregated_data: dict, sheets=None) -> dict:
+        """Данные листов отчета (всех или только sheets): {лист: {строка: {колонка: значение}}}"""
+        return {sheet.name: sheet.build_rows(aggregated_data) for sheet in self.sheets
+                if sheets is None or sheet.name in sheets}
+
+    def sources(self, sheets) -> set:
+        """Ключи данных компании, нужные для построения листов sheets"""
+        return set().union(*(self.by_name[name].sources for name in sheets if name in self.by_name))
+
+def _config_key(config: dict) -> str:
+    return json.dumps(config, sort_keys=True, ensure_ascii=False)
+
+_compiled = {}
+_lock = threading.Lock()
+
+def compile_report_config(config: dict = None) -> CompiledReportConfig:
+    """Скомпилированная раскладка (кэшируется по содержимому JSON)"""
+    config = config or DEFAULT_REPORT_CONFIG
+    key = _config_key(config)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = CompiledReportConfig(config)
+        with _lock:
+            _compiled[key] = compiled
+    return compiled
@@ -0,0 +1,67 @@
+# reports/sheet_part_cache.py
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Optional
+from config import Config
+
+class SheetPartCache:
+    """Готовые XML-части листов отчета на диске.
+
+    Ключ части - шаблон, раскладка листа, дата отчета и версии таблиц,
+    из которых лист строится. Если после загрузки изменилась только
+    реализация, ключи остальных листов прежние и их части берутся отсюда,
+    заново рендерится только лист 5.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or Config.REPORT_PARTS_DIR
+
+    def key(self, *parts) -> str:
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            # Время доступа для вытеснения давно не использованных частей
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, part_path: str):
+        """Копия отрендеренной части в кэш; замена атомарная - параллельные отчеты не видят недописанный файл"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self._path(key)}.{uuid.uuid4().hex}.tmp'
+        try:
+            shutil.copyfile(part_path, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить часть листа в кэш: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self, max_age_days: int = None) -> int:
+        """Удаление частей, к которым не обращались дольше max_age_days"""
+        max_age_days = Config.REPORT_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.xml')
+
+# Кэш частей листов процесса
+sheet_parts = SheetPartCache()
@@ -0,0 +1,164 @@
+# reports/streaming_report_writer.py
+from copy import copy
+from datetime import date
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+
+class TemplateLayout:
+    """Статическая часть шаблона, извлеченная один раз: ячейки, стили и разметка листов"""
+
+    def __init__(self, template_file):
+        self.sheets = {}
+        self.sheet_order = []
+        self._extract(template_file)
+
+    def _extract(self, template_file):
+        wb = load_workbook(template_file)
+        try:
+            for ws in wb.worksheets:
+                self.sheet_order.append(ws.title)
+                self.sheets[ws.title] = self._extract_sheet(ws)
+        finally:
+            wb.close()
+
+    def _extract_sheet(self, ws) -> dict:
+        rows = {}
+        for row in ws.iter_rows():
+            cells = {}
+            for cell in row:
+                if cell.value is None and not cell.has_style:
+                    continue
+                cells[cell.column] = (cell.value, self._cell_style(cell) if cell.has_style else None)
+            if cells:
+                rows[row[0].row] = cells
+
+        date_cells = []
+        for row in range(1, 6):
+            for col in range(1, 10):
+                value = rows.get(row, {}).get(col, (None, None))[0]
+                if value and 'дата' in str(value).lower():
+                    date_cells.append((row, col + 1))
+
+        return {
+            'rows': rows,
+            'max_row': ws.max_row,
+            'date_cells': date_cells,
+            'merged_cells': [str(rng) for rng in ws.merged_cells.ranges],
+            'merged_inner': self._merged_inner(ws),
+            'column_widths': {
+                key: (dim.width, dim.min, dim.max, dim.hidden)
+                for key, dim in ws.column_dimensions.items() if dim.customWidth or dim.hidden
+            },
+            'row_heights': {
+                idx: dim.height for idx, dim in ws.row_dimensions.items() if dim.height is not None
+            },
+            'freeze_panes': ws.freeze_panes,
+            'page_margins': copy(ws.page_margins),
+            'orientation': ws.page_setup.orientation,
+        }
+
+    def _merged_inner(self, ws) -> frozenset:
+        """(строка, колонка) объединенных ячеек кроме левой верхней - значение в них не пишется"""
+        return frozenset(
+            (row, col)
+            for rng in ws.merged_cells.ranges
+            for row in range(rng.min_row, rng.max_row + 1)
+            for col in range(rng.min_col, rng.max_col + 1)
+            if (row, col) != (rng.min_row, rng.min_col)
+        )
+
+    def _cell_style(self, cell) -> tuple:
+        return (copy(cell.font), copy(cell.fill), copy(cell.border),
+                copy(cell.alignment), cell.number_format, copy(cell.protection))
+
+# Как часто (в строках) сообщать о ходе записи листа
+PROGRESS_STEP = 50
+
+class StreamingReportWriter:
+    """Запись отчета через write-only книгу openpyxl с сохранением оформления шаблона.
+
+    Шапка листов берется из TemplateLayout, строки данных пишутся потоком
+    в порядке возрастания; строки за пределами шаблона получают оформление
+    последней строки шаблона. Память не зависит от размера объектной модели.
+    """
+
+    def __init__(self, layout: TemplateLayout):
+        self.layout = layout
+
+    def write(self, output_path: str, sheet_rows: dict, report_date: date, progress=None):
+        wb = Workbook(write_only=True)
+        date_str = report_date.strftime('%d.%m.%Y')
+        for sheet_name in self.layout.sheet_order:
+            sheet = self.layout.sheets[sheet_name]
+            rows = sheet_rows.get(sheet_name, {})
+            data_rows = dict(rows)
+            for row, col in sheet['date_cells']:
+                data_rows.setdefault(row, {})[col] = date_str
+            self._write_sheet(wb, sheet_name, sheet, data_rows, set(rows), progress)
+        wb.save(output_path)
+
+    def _write_sheet(self, wb, sheet_name: str, sheet: dict, data_rows: dict,
+                     report_rows: set = frozenset(), progress=None):
+        ws = wb.create_sheet(title=sheet_name)
+        self._apply_layout(ws, sheet)
+
+        # StyleArray на каждый уникальный стиль шаблона вычисляется один раз
+        style_arrays = {}
+
+        def styled(value, style):
+            cell = WriteOnlyCell(ws, value=value)
+            if style is not None:
+                key = id(style)
+                if key not in style_arrays:
+                    font, fill, border, alignment, number_format, protection = style
+                    cell.font, cell.fill, cell.border = font, fill, border
+                    cell.alignment, cell.number_format, cell.protection = alignment, number_format, protection
+                    style_arrays[key] = copy(cell._style)
+                else:
+                    cell._style = copy(style_arrays[key])
+            return cell
+
+        template_rows = sheet['rows']
+        template_max = sheet['max_row']
+        merged_inner = sheet['merged_inner']
+        repeat_row = template_rows.get(template_max, {})
+        last_row = max([template_max, *data_rows.keys()]) if data_rows else template_max
+
+        total, done = len(report_rows), 0
+        for row_idx in range(1, last_row + 1):
+            if row_idx in report_rows:
+                done += 1
+                if progress and (done % PROGRESS_STEP == 0 or done == total):
+                    progress(sheet_name, done, total)
+            template_cells = template_rows.get(row_idx, repeat_row if row_idx > template_max else {})
+            values = data_rows.get(row_idx, {})
+            if not template_cells and not values:
+                ws.append([])
+                continue
+            max_col = max([*template_cells.keys(), *values.keys()])
+            row = []
+            for col in range(1, max_col + 1):
+                template_value, style = template_cells.get(col, (None, None))
+                if col in values and (row_idx, col) not in merged_inner:
+                    value = values[col]
+                else:
+                    value = template_value if row_idx <= template_max else None
+                row.append(styled(value, style) if style is not None or value is not None else None)
+            ws.append(row)
+        if progress and not total:
+            progress(sheet_name, 0, 0)
+
+    def _apply_layout(self, ws, sheet: dict):
+        for key, (width, min_col, max_col, hidden) in sheet['column_widths'].items():
+            dim = ws.column_dimensions[key]
+            dim.width = width
+            dim.min, dim.max = min_col, max_col
+            dim.hidden = hidden
+        for idx, height in sheet['row_heights'].items():
+            ws.row_dimensions[idx].height = height
+        for rng in sheet['merged_cells']:
+            ws.merged_cells.add(rng)
+        if sheet['freeze_panes']:
+            ws.freeze_panes = sheet['freeze_panes']
+        ws.page_margins = copy(sheet['page_margins'])
+        ws.page_setup.orientation = sheet['orientation']
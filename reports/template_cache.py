@@ -0,0 +1,63 @@
+# reports/template_cache.py
+import io
+import os
+import threading
+
+DEFAULT_TEMPLATE_PATHS = [
+    'report_templates/Сводный_отчет_шаблон.xlsx',
+    '../report_templates/Сводный_отчет_шаблон.xlsx',
+    './report_templates/Сводный_отчет_шаблон.xlsx'
+]
+
+class CompiledTemplate:
+    """Шаблон отчета, разобранный один раз и общий для всех запросов.
+
+    Хранит байты .xlsx (openpyxl-движок грузит книгу из памяти, а не с диска),
+    координаты ячеек даты, стили и разметку листов (TemplateLayout), а также
+    части zip-архива с разобранными до строк листами (XmlTemplate).
+    """
+
+    def __init__(self, path: str, mtime: int):
+        # openpyxl грузится при первой компиляции, а не при импорте модуля
+        from reports.streaming_report_writer import TemplateLayout
+        from reports.xml_patch_renderer import XmlTemplate
+        self.path = path
+        self.mtime = mtime
+        with open(path, 'rb') as f:
+            self.raw = f.read()
+        self.layout = TemplateLayout(io.BytesIO(self.raw))
+        self.sheet_names = list(self.layout.sheet_order)
+        self.date_cells = {name: sheet['date_cells'] for name, sheet in self.layout.sheets.items()}
+        self.max_rows = {name: sheet['max_row'] for name, sheet in self.layout.sheets.items()}
+        self.merged_inner = {name: sheet['merged_inner'] for name, sheet in self.layout.sheets.items()}
+        self.xml = XmlTemplate(self.raw)
+
+    def open_stream(self) -> io.BytesIO:
+        return io.BytesIO(self.raw)
+
+_compiled = {}
+_lock = threading.Lock()
+
+def resolve_template_path(template_path: str = None) -> str:
+    """Путь к шаблону: указанный или первый найденный из стандартных"""
+    if template_path and os.path.exists(template_path):
+        return template_path
+    for path in DEFAULT_TEMPLATE_PATHS:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Шаблон не найден. Искал: {DEFAULT_TEMPLATE_PATHS}")
+
+def get_compiled_template(template_path: str = None) -> CompiledTemplate:
+    """Скомпилированный шаблон; перекомпилируется только при смене mtime файла"""
+    path = os.path.abspath(resolve_template_path(template_path))
+    mtime = os.stat(path).st_mtime_ns
+    compiled = _compiled.get(path)
+    if compiled is not None and compiled.mtime == mtime:
+        return compiled
+    with _lock:
+        compiled = _compiled.get(path)
+        if compiled is None or compiled.mtime != mtime:
+            print(f"📐 Компиляция шаблона отчета: {path}")
+            compiled = CompiledTemplate(path, mtime)
+            _compiled[path] = compiled
+        return compiled
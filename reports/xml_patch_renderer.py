@@ -0,0 +1,311 @@
+# reports/xml_patch_renderer.py
+import io
+import math
+import multiprocessing
+import numbers
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from xml.sax.saxutils import escape, unescape
+from openpyxl.utils import get_column_letter, column_index_from_string
+from reports.streaming_report_writer import PROGRESS_STEP
+
+_ROW_RE = re.compile(r'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_SHEET_DATA_RE = re.compile(r'<sheetData\s*/>|<sheetData>(.*?)</sheetData>', re.S)
+_DIMENSION_RE = re.compile(r'<dimension ref="([^"]*)"\s*/>')
+_CELL_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+# Символы, недопустимые в XML 1.0
+_ILLEGAL_XML_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CALC_CHAIN_PART = 'xl/calcChain.xml'
+
+def _attrs(text: str) -> dict:
+    return dict(_ATTR_RE.findall(text or ''))
+
+def _attrs_xml(attrs: dict) -> str:
+    return ''.join(f' {key}="{value}"' for key, value in attrs.items())
+
+class XmlSheet:
+    """Разобранная XML-часть листа: текст до и после sheetData и строки шаблона"""
+
+    def __init__(self, xml: str):
+        match = _SHEET_DATA_RE.search(xml)
+        if match is None:
+            raise ValueError('В листе нет sheetData')
+        self.prefix = xml[:match.start()] + '<sheetData>'
+        self.suffix = '</sheetData>' + xml[match.end():]
+        # {строка: (атрибуты строки, {колонка: (атрибуты ячейки, исходный XML ячейки)})}
+        self.rows = {}
+        row_idx = 0
+        for row_match in _ROW_RE.finditer(match.group(1) or ''):
+            row_attrs = _attrs(row_match.group(1))
+            row_idx = int(row_attrs.get('r', row_idx + 1))
+            row_attrs.pop('spans', None)
+            cells = {}
+            col_idx = 0
+            for cell_match in _CELL_RE.finditer(row_match.group(2) or ''):
+                cell_attrs = _attrs(cell_match.group(1))
+                ref = _CELL_REF_RE.match(cell_attrs.get('r', ''))
+                col_idx = column_index_from_string(ref.group(1)) if ref else col_idx + 1
+                cells[col_idx] = (cell_attrs, cell_match.group(0))
+            self.rows[row_idx] = (row_attrs, cells)
+        self.max_row = max(self.rows) if self.rows else 0
+        self.max_col = max((max(cells) for _, cells in self.rows.values() if cells), default=0)
+
+class XmlTemplate:
+    """Шаблон .xlsx как набор частей zip-архива; листы разобраны до строк"""
+
+    def __init__(self, raw: bytes):
+        with zipfile.ZipFile(io.BytesIO(raw)) as zf:
+            self.parts = [(info, zf.read(info.filename)) for info in zf.infolist()]
+        contents = {info.filename: data for info, data in self.parts}
+        self.sheet_parts = self._sheet_parts(contents)
+        self.sheets = {
+            name: XmlSheet(contents[part].decode('utf-8')) for name, part in self.sheet_parts.items()
+        }
+        self.has_calc_chain = CALC_CHAIN_PART in contents
+
+    def _sheet_parts(self, contents: dict) -> dict:
+        """Имя листа -> путь XML-части (через workbook.xml и его связи)"""
+        rels = {
+            attrs['Id']: attrs['Target']
+            for attrs in map(_attrs, re.findall(r'<Relationship\b([^>]*)/>',
+                                                contents['xl/_rels/workbook.xml.rels'].decode('utf-8')))
+        }
+        parts = {}
+        for sheet_attrs in map(_attrs, re.findall(r'<sheet\b([^>]*)/>', contents['xl/workbook.xml'].decode('utf-8'))):
+            target = rels[sheet_attrs['r:id']]
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            parts[unescape(sheet_attrs['name'], {'&quot;': '"', '&apos;': "'"})] = path
+        return parts
+
+class XmlPatchRenderer:
+    """Запись отчета прямо в zip-архив шаблона, без объектной модели openpyxl.
+
+    Неизмененные части (стили, общие строки, тема, свойства) копируются как есть,
+    заново генерируется только sheetData листов: ячейки шаблона переносятся
+    исходным XML, ячейки данных получают id стиля ячейки шаблона и пишутся
+    inline-строками или числами. Строки за пределами шаблона берут стили
+    последней строки шаблона.
+    """
+
+    def __init__(self, template: XmlTemplate, date_cells: dict = None):
+        self.template = template
+        self.date_cells = date_cells or {}
+
+    def write(self, output_path: str, sheet_rows: dict, report_date: date, progress=None, processes: int = 0,
+              cached_parts: dict = None, save_part=None):
+        """processes > 0 - листы рендерятся параллельно в отдельных процессах.
+
+        cached_parts - {лист: путь к готовой XML-части}, такие листы копируются
+        без рендера; save_part(лист, путь) получает заново отрендеренные части.
+        """
+        cached_parts = cached_parts or {}
+        date_str = report_date.strftime('%d.%m.%Y')
+        sheet_by_part = {part: name for name, part in self.template.sheet_parts.items()}
+        jobs = {}
+        for name in self.template.sheet_parts:
+            if name in cached_parts:
+                continue
+            rows = sheet_rows.get(name, {})
+            data_rows = dict(rows)
+            for row, col in self.date_cells.get(name, []):
+                data_rows[row] = {**data_rows.get(row, {}), col: date_str}
+            jobs[name] = (data_rows, set(rows))
+
+        with tempfile.TemporaryDirectory(prefix='report_parts_') as parts_dir:
+            executor, futures = self._submit_sheets(jobs, parts_dir, processes) if processes else (None, {})
+            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for info, data in self.template.parts:
+                    name = sheet_by_part.get(info.filename)
+                    if name is None:
+                        if info.filename == CALC_CHAIN_PART:
+                            continue
+                        zf.writestr(self._copy_info(info), self._strip_calc_chain(info.filename, data))
+                        continue
+                    if name in cached_parts:
+                        self._copy_part(zf, info, cached_parts[name])
+                        continue
+                    data_rows, report_rows = jobs[name]
+                    if name in futures:
+                        # Готовый XML листа из рабочего процесса
+                        try:
+                            part_path = futures[name].result()
+                        except BrokenProcessPool:
+                            # Рабочий процесс упал - пул пересоздастся, а лист дорендерим здесь
+                            _discard_executor(executor)
+                            part_path = _render_sheet_part(name, self.template.sheets[name], data_rows, report_rows,
+                                                           os.path.join(parts_dir, f'{name}.xml'))
+                        self._copy_part(zf, info, part_path)
+                        if progress:
+                            progress(name, len(report_rows), len(report_rows))
+                    elif save_part:
+                        # Часть пойдет в кэш - сначала во временный файл
+                        part_path = _render_sheet_part(name, self.template.sheets[name], data_rows, report_rows,
+                                                       os.path.join(parts_dir, f'{name}.xml'), progress)
+                        self._copy_part(zf, info, part_path)
+                    else:
+                        with zf.open(self._copy_info(info), 'w') as part:
+                            for chunk in self._render_sheet(name, self.template.sheets[name], data_rows, report_rows, progress):
+                                part.write(chunk.encode('utf-8'))
+                        continue
+                    if save_part:
+                        save_part(name, part_path)
+
+    def _submit_sheets(self, jobs: dict, parts_dir: str, processes: int) -> tuple:
+        executor = _sheet_executor(processes)
+        try:
+            futures = self._submit_to(executor, jobs, parts_dir)
+        except BrokenProcessPool:
+            # Пул сломался после прошлого отчета - одна попытка на новом
+            _discard_executor(executor)
+            executor = _sheet_executor(processes)
+            futures = self._submit_to(executor, jobs, parts_dir)
+        return executor, futures
+
+    def _submit_to(self, executor: ProcessPoolExecutor, jobs: dict, parts_dir: str) -> dict:
+        return {
+            name: executor.submit(
+                _render_sheet_part, name, self.template.sheets[name], data_rows, report_rows,
+                os.path.join(parts_dir, f'sheet{index}.xml')
+            )
+            for index, (name, (data_rows, report_rows)) in enumerate(jobs.items(), 1)
+        }
+
+    def _copy_part(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, part_path: str):
+        with open(part_path, 'rb') as src, zf.open(self._copy_info(info), 'w') as part:
+            shutil.copyfileobj(src, part, 1024 * 1024)
+
+    def _copy_info(self, info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+        copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        copy.compress_type = zipfile.ZIP_DEFLATED
+        copy.external_attr = info.external_attr
+        return copy
+
+    def _strip_calc_chain(self, filename: str, data: bytes) -> bytes:
+        """Цепочка вычислений ссылается на старые ячейки - Excel перестроит ее сам"""
+        if not self.template.has_calc_chain:
+            return data
+        if filename == '[Content_Types].xml':
+            return re.sub(rb'<Override[^>]*PartName="/xl/calcChain.xml"[^>]*/>', b'', data)
+        if filename == 'xl/_rels/workbook.xml.rels':
+            return re.sub(rb'<Relationship[^>]*Target="[^"]*calcChain.xml"[^>]*/>', b'', data)
+        return data
+
+    def _render_sheet(self, sheet_name: str, sheet: XmlSheet, data_rows: dict, report_rows: set, progress=None):
+        last_row = max([sheet.max_row, *data_rows])
+        max_col = max([sheet.max_col, *(col for cells in data_rows.values() for col in cells)], default=1)
+        prefix = sheet.prefix
+        if last_row:
+            prefix = _DIMENSION_RE.sub(
+                f'<dimension ref="A1:{get_column_letter(max(max_col, 1))}{last_row}"/>', prefix, count=1
+            )
+        yield prefix
+
+        repeat_attrs, repeat_cells = sheet.rows.get(sheet.max_row, ({}, {}))
+        repeat_styles = {col: attrs['s'] for col, (attrs, _) in repeat_cells.items() if 's' in attrs}
+        total, done = len(report_rows), 0
+        chunk = []
+        for row_idx in sorted(set(sheet.rows) | set(data_rows)):
+            values = data_rows.get(row_idx, {})
+            if row_idx in sheet.rows:
+                row_attrs, template_cells = sheet.rows[row_idx]
+                chunk.append(self._template_row(row_idx, row_attrs, template_cells, values))
+            else:
+                chunk.append(self._new_row(row_idx, repeat_attrs, repeat_styles, values))
+            if row_idx in report_rows:
+                done += 1
+                if progress and (done % PROGRESS_STEP == 0 or done == total):
+                    progress(sheet_name, done, total)
+            if len(chunk) >= PROGRESS_STEP:
+                yield ''.join(chunk)
+                chunk = []
+        if progress and not total:
+            progress(sheet_name, 0, 0)
+        chunk.append(sheet.suffix)
+        yield ''.join(chunk)
+
+    def _template_row(self, row_idx: int, row_attrs: dict, template_cells: dict, values: dict) -> str:
+        cells = []
+        for col in sorted(set(template_cells) | set(values)):
+            if col in values:
+                style = template_cells[col][0].get('s') if col in template_cells else None
+                cells.append(self._cell(row_idx, col, values[col], style))
+            else:
+                cells.append(template_cells[col][1])
+        return f'<row{_attrs_xml({**row_attrs, "r": str(row_idx)})}>{"".join(cells)}</row>'
+
+    def _new_row(self, row_idx: int, repeat_attrs: dict, repeat_styles: dict, values: dict) -> str:
+        cells = [
+            self._cell(row_idx, col, values.get(col), repeat_styles.get(col))
+            for col in sorted(set(repeat_styles) | set(values))
+        ]
+        return f'<row{_attrs_xml({**repeat_attrs, "r": str(row_idx)})}>{"".join(cells)}</row>'
+
+    def _cell(self, row_idx: int, col: int, value, style: str = None) -> str:
+        attrs = f' r="{get_column_letter(col)}{row_idx}"'
+        if style is not None:
+            attrs += f' s="{style}"'
+        if value is None or value == '':
+            return f'<c{attrs}/>'
+        if isinstance(value, bool):
+            return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Integral):
+            return f'<c{attrs}><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Real):
+            if not math.isfinite(value):
+                return f'<c{attrs}/>'
+            # Тот же формат, что у openpyxl
+            return f'<c{attrs}><v>{float(value):.16g}</v></c>'
+        if isinstance(value, (datetime, date)):
+            value = value.strftime('%d.%m.%Y')
+        text = escape(_ILLEGAL_XML_RE.sub('', str(value)))
+        space = ' xml:space="preserve"' if text != text.strip() else ''
+        return f'<c{attrs} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+_executor = None
+_executor_size = None
+_executor_lock = threading.Lock()
+
+def _sheet_executor(processes: int) -> ProcessPoolExecutor:
+    """Общий пул процессов для листов.
+
+    spawn, потому что родитель многопоточный (очередь отчетов); точка входа
+    должна быть под if __name__ == '__main__', как в run.py.
+    """
+    global _executor, _executor_size
+    with _executor_lock:
+        # Пул пересоздается при смене размера; сломанный пул сбрасывает _discard_executor
+        if _executor is None or _executor_size != processes:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            _executor_size = processes
+        return _executor
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """Убрать пул, поднявший BrokenProcessPool: следующий _sheet_executor создаст новый"""
+    global _executor, _executor_size
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+            _executor_size = None
+    executor.shutdown(wait=False)
+
+def _render_sheet_part(sheet_name: str, sheet: XmlSheet, data_rows: dict, report_rows: set, part_path: str,
+                       progress=None) -> str:
+    """Рендер XML одного листа во временный файл (в т.ч. в рабочем процессе)"""
+    renderer = XmlPatchRenderer(None)
+    with open(part_path, 'wb') as part:
+        for chunk in renderer._render_sheet(sheet_name, sheet, data_rows, report_rows, progress):
+            part.write(chunk.encode('utf-8'))
+    return part_path
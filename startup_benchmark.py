@@ -0,0 +1,92 @@
+# startup_benchmark.py - время старта процесса: python startup_benchmark.py [--runs 5] [--top 15]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+# Модули, которые раньше импортировались при старте (openpyxl, парсер, генератор отчетов)
+EAGER_MODULES = ['parser.unified_parser', 'reports.template_report_generator', 'app.services.report_generator']
+# Тяжелые зависимости, которых не должно быть в sys.modules после create_app()
+LAZY_MODULES = ['openpyxl', 'pandas', 'numpy', 'duckdb']
+
+def run_importtime(statement: str) -> dict:
+    """Запуск statement в новом интерпретаторе с -X importtime: {модуль: (собственное, накопленное) мкс}"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def run_wall(statement: str, runs: int) -> float:
+    """Медиана полного времени процесса (импорт + create_app) в миллисекундах"""
+    timer = ('import time; _t = time.perf_counter()\n'
+             f'{statement}\n'
+             'print(round((time.perf_counter() - _t) * 1000, 1))')
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', timer], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def loaded_after_start(modules: list) -> dict:
+    """{модуль: загружен ли} в новом интерпретаторе после create_app()"""
+    check = ('import json, sys; from app import create_app; create_app(); '
+             f'print(json.dumps({{m: m in sys.modules for m in {modules!r}}}))')
+    completed = subprocess.run([sys.executable, '-c', check], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение времени старта: ленивые импорты против прежних eager-импортов')
+    parser.add_argument('--runs', type=int, default=5, help='Запусков на вариант (берется медиана)')
+    parser.add_argument('--top', type=int, default=15, help='Сколько самых тяжелых модулей показать')
+    args = parser.parse_args()
+
+    eager = '; '.join(f'import {m}' for m in EAGER_MODULES)
+    scenarios = [
+        ('lazy', 'from app import create_app; create_app()'),
+        ('eager', f'{eager}; from app import create_app; create_app()'),
+    ]
+
+    results = {}
+    for name, statement in scenarios:
+        modules = run_importtime(statement)
+        results[name] = {
+            'modules': modules,
+            'import_ms': sum(self_us for self_us, _ in modules.values()) / 1000,
+            'wall_ms': run_wall(statement, args.runs),
+        }
+
+    print(f"\n⏱️ Старт процесса (медиана из {args.runs} запусков)")
+    for name, result in results.items():
+        print(f"   {name:<6} импорт {result['import_ms']:8.1f} мс   всего {result['wall_ms']:8.1f} мс   модулей {len(result['modules'])}")
+    gain = results['eager']['wall_ms'] - results['lazy']['wall_ms']
+    print(f"   выигрыш: {gain:.1f} мс ({gain / results['eager']['wall_ms'] * 100:.0f}%)")
+
+    lazy_modules = results['lazy']['modules']
+    deferred = {m: t for m, t in results['eager']['modules'].items() if m not in lazy_modules}
+    print(f"\n💤 Отложено до первого использования: {len(deferred)} модулей, "
+          f"{sum(s for s, _ in deferred.values()) / 1000:.1f} мс")
+    top_level = sorted({m.split('.')[0] for m in deferred})
+    print(f"   пакеты: {', '.join(top_level)}")
+
+    print(f"\n🐢 Самые тяжелые импорты при старте (накопленное время):")
+    for module, (_, cumulative_us) in sorted(lazy_modules.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"   {cumulative_us / 1000:8.1f} мс  {module}")
+
+    loaded = loaded_after_start(LAZY_MODULES)
+    print(f"\n📦 После create_app() в sys.modules:")
+    for module, is_loaded in loaded.items():
+        print(f"   {'❌ загружен' if is_loaded else '✅ не загружен'}  {module}")
+    if any(loaded.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# Отдельная SQLite-база и каталог частей отчетов: config.py читает переменные при импорте,
+# поэтому они задаются до первого импорта модулей приложения
+_TEST_DIR = tempfile.mkdtemp(prefix='fuel_reports_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ['REPORT_PARTS_DIR'] = os.path.join(_TEST_DIR, 'report_parts')
+
+@pytest.fixture(scope='session')
+def database():
+    """Схема тестовой базы (без тестовых компаний) и общее подключение"""
+    from database.bootstrap import bootstrap
+    from database.connection import db_connection
+    bootstrap(seed=False)
+    return db_connection
+
+@pytest.fixture
+def session(database):
+    session = database.session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def company(session):
+    """Новая компания на каждый тест - данные тестов не пересекаются"""
+    from database.models import Company
+    count = session.query(Company).count()
+    company = Company(name=f'Тестовая компания {count + 1}', code=f'TEST{count + 1}')
+    session.add(company)
+    session.commit()
+    return company
+
+@pytest.fixture
+def make_file(session, company):
+    """Фабрика записей uploaded_files компании; undated=True - запись без даты загрузки"""
+    from datetime import date, datetime
+    from database.models import UploadedFile
+
+    def make(name: str = 'report.xlsx', upload_date: datetime = None, undated: bool = False,
+             report_date: date = date(2026, 2, 1)) -> int:
+        uploaded = UploadedFile(company_id=company.id, filename=name, file_path=name,
+                                report_date=report_date, upload_date=upload_date, status='processed')
+        session.add(uploaded)
+        session.flush()
+        # default=datetime.now срабатывает и на None при вставке - NULL ставится отдельным UPDATE
+        if undated:
+            session.query(UploadedFile).filter(UploadedFile.id == uploaded.id).update({'upload_date': None})
+        session.commit()
+        return uploaded.id
+    return make
@@ -0,0 +1,73 @@
+# tests/test_diff_ingest.py
+from datetime import date
+
+import pytest
+
+from config import Config
+from database.models import DataHistory, Sheet1Structure
+from database.queries import DatabaseQueries
+
+REPORT_DATE = date(2026, 2, 1)
+
+@pytest.fixture(autouse=True)
+def diff_mode(monkeypatch):
+    monkeypatch.setattr(Config, 'INGEST_MODE', 'diff')
+
+def _structure_rows():
+    # Две одинаковые по ключу строки различает только порядковый номер вхождения
+    return [
+        {'affiliation': 'ВИНК', 'company': 'АЗС Север', 'oil_depots_count': 1, 'azs_count': 4, 'working_azs_count': 4},
+        {'affiliation': 'ВИНК', 'company': 'АЗС Север', 'oil_depots_count': 1, 'azs_count': 4, 'working_azs_count': 4},
+        {'affiliation': 'Независимые', 'company': 'АЗС Юг', 'oil_depots_count': 0, 'azs_count': 2, 'working_azs_count': 1},
+    ]
+
+def _history_count(session, file_id: int) -> int:
+    return session.query(DataHistory).filter(DataHistory.changed_by == f'ingest:file_{file_id}').count()
+
+def _row_ids(session, file_id: int) -> list:
+    return [row.id for row in session.query(Sheet1Structure.id).filter(
+        Sheet1Structure.file_id == file_id).order_by(Sheet1Structure.id)]
+
+def test_identical_reupload_writes_no_history(session, company, make_file):
+    file_id = make_file('structure.xlsx')
+    queries = DatabaseQueries()
+
+    first = queries.save_sheet1_data(file_id, company.id, REPORT_DATE, _structure_rows())
+    assert first['inserted'] == 3
+    assert _history_count(session, file_id) == 3
+    ids = _row_ids(session, file_id)
+
+    second = queries.save_sheet1_data(file_id, company.id, REPORT_DATE, _structure_rows())
+    assert second == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3}
+    assert _history_count(session, file_id) == 3
+    assert _row_ids(session, file_id) == ids
+
+def test_changed_duplicate_updates_only_its_occurrence(session, company, make_file):
+    file_id = make_file('structure_fix.xlsx')
+    queries = DatabaseQueries()
+    queries.save_sheet1_data(file_id, company.id, REPORT_DATE, _structure_rows())
+    ids = _row_ids(session, file_id)
+
+    rows = _structure_rows()
+    rows[1]['working_azs_count'] = 3
+    stats = queries.save_sheet1_data(file_id, company.id, REPORT_DATE, rows)
+
+    assert stats == {'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 2}
+    assert _row_ids(session, file_id) == ids
+    update = session.query(DataHistory).filter(
+        DataHistory.changed_by == f'ingest:file_{file_id}', DataHistory.operation == 'UPDATE').one()
+    assert update.record_id == ids[1]
+    assert update.old_data == {'working_azs_count': 4}
+    assert update.new_data == {'working_azs_count': 3}
+
+def test_dropped_row_is_deleted_with_history(session, company, make_file):
+    file_id = make_file('structure_drop.xlsx')
+    queries = DatabaseQueries()
+    queries.save_sheet1_data(file_id, company.id, REPORT_DATE, _structure_rows())
+
+    stats = queries.save_sheet1_data(file_id, company.id, REPORT_DATE, _structure_rows()[:2])
+
+    assert stats == {'inserted': 0, 'updated': 0, 'deleted': 1, 'unchanged': 2}
+    assert len(_row_ids(session, file_id)) == 2
+    assert session.query(DataHistory).filter(
+        DataHistory.changed_by == f'ingest:file_{file_id}', DataHistory.operation == 'DELETE').count() == 1
@@ -0,0 +1,59 @@
+# tests/test_keyset_pages.py
+from datetime import datetime
+
+import pytest
+
+from database.models import UploadedFile
+from database.queries import DatabaseQueries, decode_cursor
+
+@pytest.fixture
+def files(make_file):
+    """Файлы с датой загрузки (две с одинаковой датой) и без нее"""
+    same = datetime(2026, 1, 10, 12, 0)
+    for name, upload_date in (('a.xlsx', datetime(2026, 1, 9)), ('b.xlsx', same), ('c.xlsx', same)):
+        make_file(name, upload_date=upload_date)
+    for name in ('legacy1.xlsx', 'legacy2.xlsx', 'legacy3.xlsx'):
+        make_file(name, undated=True)
+
+def _expected_order(session) -> list:
+    # Сначала по (upload_date, id) по убыванию, затем файлы без даты по убыванию id
+    rows = session.query(UploadedFile.id, UploadedFile.upload_date).all()
+    dated = sorted((r for r in rows if r.upload_date is not None), key=lambda r: (r.upload_date, r.id), reverse=True)
+    undated = sorted((r for r in rows if r.upload_date is None), key=lambda r: r.id, reverse=True)
+    return [r.id for r in dated + undated]
+
+def _walk(limit: int) -> tuple:
+    queries = DatabaseQueries()
+    ids, cursors, cursor = [], [], None
+    while True:
+        page, cursor = queries.get_recent_files_page(limit=limit, cursor=cursor)
+        ids += [f['id'] for f in page]
+        if not cursor:
+            return ids, cursors
+        cursors.append(decode_cursor(cursor))
+
+@pytest.mark.parametrize('shift', [-1, 0, 1])
+def test_cursor_round_trip_across_null_upload_date(session, files, shift):
+    expected = _expected_order(session)
+    dated = session.query(UploadedFile).filter(UploadedFile.upload_date.isnot(None)).count()
+    # Граница страницы перед последней строкой с датой, ровно на ней и на первой строке без даты
+    limit = dated + shift
+
+    ids, cursors = _walk(limit)
+
+    assert ids == expected
+    boundary = cursors[0]
+    if shift == 1:
+        assert boundary[0] is None
+    else:
+        assert boundary[0] is not None
+
+def test_undated_tail_pages_by_id(session, files):
+    expected = _expected_order(session)
+    undated = session.query(UploadedFile).filter(UploadedFile.upload_date.is_(None)).count()
+
+    ids, cursors = _walk(1)
+
+    assert ids == expected
+    # После каждой строки без даты, кроме последней, курсор несет пустую дату
+    assert sum(1 for upload_date, _ in cursors if upload_date is None) == undated - 1
@@ -0,0 +1,48 @@
+# tests/test_report_backends.py
+from datetime import date
+
+from openpyxl import load_workbook
+
+from reports.template_report_generator import TemplateReportGenerator
+
+STRUCTURE_SHEET = '1-Структура'
+BACKENDS = ('openpyxl', 'streaming', 'xml')
+
+def _structure_data(companies: int) -> dict:
+    return {
+        f'Компания {i}': {'sheet1': [{
+            'affiliation': 'ВИНК', 'company_name': f'Компания {i}',
+            'oil_depots_count': i, 'azs_count': 2 * i, 'working_azs_count': i,
+        }]}
+        for i in range(1, companies + 1)
+    }
+
+def _sheet_values(path: str, sheet: str) -> dict:
+    wb = load_workbook(path)
+    try:
+        return {(cell.row, cell.column): cell.value
+                for row in wb[sheet].iter_rows() for cell in row if cell.value is not None}
+    finally:
+        wb.close()
+
+def test_structure_rows_over_merged_cells_match_across_backends(tmp_path):
+    # С 10-й строки структуры данные доходят до объединенных ячеек шаблона (B22:D22 ...)
+    aggregated = _structure_data(12)
+    values = {}
+    for backend in BACKENDS:
+        output = str(tmp_path / f'{backend}.xlsx')
+        TemplateReportGenerator(None, backend=backend).render(output, aggregated, date(2026, 2, 1),
+                                                              sheet_processes=0)
+        values[backend] = _sheet_values(output, STRUCTURE_SHEET)
+
+    assert values['streaming'] == values['openpyxl']
+    assert values['xml'] == values['openpyxl']
+    for i in range(1, 13):
+        assert values['openpyxl'][(12 + i, 2)] == f'Компания {i}'
+
+def test_merged_inner_cells_exclude_anchor():
+    generator = TemplateReportGenerator(None, backend='openpyxl')
+    merged_inner = generator.template.merged_inner[STRUCTURE_SHEET]
+    # B22:D22 - пишется только B22
+    assert (22, 2) not in merged_inner
+    assert {(22, 3), (22, 4)} <= merged_inner
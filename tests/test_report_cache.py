@@ -0,0 +1,61 @@
+# tests/test_report_cache.py
+import os
+from datetime import date
+
+import pytest
+
+from app.services.report_cache import ReportCache
+from database.models import GeneratedReport, Sheet1Structure
+from database.queries import db
+from database.versioning import data_versions
+from reports.template_report_generator import TemplateReportGenerator
+
+@pytest.fixture
+def rendered(tmp_path, monkeypatch):
+    """Генерация заменена записью маленького файла; список - пути построенных отчетов"""
+    paths = []
+
+    def generate_report(self, report_date=None, progress=None, events=None):
+        path = tmp_path / f'report_{len(paths) + 1}.xlsx'
+        path.write_bytes(b'report')
+        paths.append(str(path))
+        return str(path)
+
+    monkeypatch.setattr(TemplateReportGenerator, 'generate_report', generate_report)
+    return paths
+
+def test_repeated_request_is_served_from_cache(database, rendered):
+    cache = ReportCache(db)
+    first, cached = cache.get_or_generate(date(2026, 3, 1))
+    assert not cached
+
+    again, cached = cache.get_or_generate(date(2026, 3, 1))
+    assert cached
+    assert again == first
+    assert len(rendered) == 1
+
+def test_data_version_bump_makes_cached_report_stale(database, session, rendered):
+    cache = ReportCache(db)
+    first, _ = cache.get_or_generate(date(2026, 3, 2))
+
+    data_versions.bump(session, Sheet1Structure.__tablename__)
+    session.commit()
+
+    fresh, cached = cache.get_or_generate(date(2026, 3, 2))
+    assert not cached
+    assert fresh != first
+    assert len(rendered) == 2
+
+def test_missing_file_is_regenerated_and_evicted(database, session, rendered):
+    cache = ReportCache(db)
+    first, _ = cache.get_or_generate(date(2026, 3, 3))
+    record_id = session.query(GeneratedReport.id).filter(GeneratedReport.file_path == os.path.abspath(first)).scalar()
+
+    # Файл пропал с диска - запись с тем же ключом больше не считается свежей
+    os.remove(first)
+    fresh, cached = cache.get_or_generate(date(2026, 3, 3))
+    assert not cached
+    assert fresh != first
+
+    session.expire_all()
+    assert session.get(GeneratedReport, record_id).status == 'evicted'
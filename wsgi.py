@@ -0,0 +1,14 @@
+# wsgi.py - точка входа для продакшн-сервера: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+from app import create_app, warm_up
+from config import Config
+
+# Необходимые папки
+os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(Config.REPORTS_FOLDER, exist_ok=True)
+os.makedirs('report_templates', exist_ok=True)
+
+app = create_app()
+
+# Шаблон и кэш компаний - до fork воркеров (при preload_app их получают все воркеры)
+warm_up()